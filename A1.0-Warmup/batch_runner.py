@@ -0,0 +1,95 @@
+import csv
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import check_plan_a_c
+import find_instructions_d_f
+
+# First line of a problem file -> function that solves it
+CASES = {
+    'CHECK PLAN': check_plan_a_c.process_file,
+    'FIND PLAN': find_instructions_d_f.process_file,
+}
+
+def detect_case(input_path):
+    with open(input_path, 'r') as f:
+        header = f.readline().strip()
+    if header not in CASES:
+        raise ValueError(f"Unknown problem type {header!r} in {input_path}")
+    return header
+
+def solution_path(input_path, output_dir):
+    name = os.path.basename(input_path).replace('problem', 'solution', 1)
+    return os.path.join(output_dir, name)
+
+def run_one(paths):
+    # Runs in a worker process; errors are reported instead of stopping the batch. Tracing
+    # allocations would slow the solvers down several times, so memory is the peak RSS of
+    # the worker (kB on Linux), which includes the files it solved before.
+    input_path, output_path = paths
+    start = time.perf_counter()
+    try:
+        case = detect_case(input_path)
+        CASES[case](input_path, output_path)
+        status = 'ok'
+    except Exception as error:
+        case = None
+        status = f"error: {error}"
+    seconds = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        'file': os.path.basename(input_path),
+        'case': case,
+        'seconds': round(seconds, 4),
+        'peak_rss_kib': peak,
+        'status': status,
+    }
+
+def run_batch(input_dir, output_dir, workers=None, case=None, report_path=None):
+    """
+    Solves every problem_*.txt in input_dir on a process pool and writes the solutions
+    to output_dir. If case is given, only files of that type are solved.
+
+    Returns one report row per file (wall time in seconds and peak RSS of the worker);
+    the rows are also written to report_path as CSV if it is given.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    input_paths = sorted(os.path.join(input_dir, name) for name in os.listdir(input_dir)
+                         if name.startswith('problem') and name.endswith('.txt'))
+    if case is not None:
+        input_paths = [path for path in input_paths if detect_case(path) == case]
+    jobs = [(path, solution_path(path, output_dir)) for path in input_paths]
+
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(jobs) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        report = list(pool.map(run_one, jobs, chunksize=chunksize))
+
+    if report_path is not None:
+        with open(report_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['file', 'case', 'seconds', 'peak_rss_kib', 'status'])
+            writer.writeheader()
+            writer.writerows(report)
+    return report
+
+def main():
+    if len(sys.argv) not in (3, 4):
+        print("Usage: python batch_runner.py <input_dir> <output_dir> [workers]")
+        sys.exit(1)
+
+    input_dir, output_dir = sys.argv[1], sys.argv[2]
+    workers = int(sys.argv[3]) if len(sys.argv) == 4 else None
+    report_path = os.path.join(output_dir, 'report.csv')
+    start = time.perf_counter()
+    report = run_batch(input_dir, output_dir, workers, report_path=report_path)
+
+    failed = [row for row in report if row['status'] != 'ok']
+    for row in failed:
+        print(f"{row['file']}: {row['status']}")
+    print(f"Solved {len(report) - len(failed)} of {len(report)} files in {time.perf_counter() - start:.2f}s")
+    print(f"Report written to {report_path}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+from collections import deque
+from compiled_map import DIRECTIONS
+
+def count_cells(bits):
+    return bin(bits).count('1')
+
+def cells_of(bits):
+    cells = []
+    while bits:
+        low = bits & -bits
+        cells.append(low.bit_length() - 1)
+        bits ^= low
+    return cells
+
+class BeliefSpace:
+    """
+    Sets of possible robot positions stored as bitsets (bit k = cell k of a CompiledMap).
+
+    A move is applied to the whole set with shifts and masks: cells whose next cell is a
+    wall stay, all other cells shift by one row or column (with wraparound), and cells
+    that land on a portal are swapped for the portal's partner. The cost of a move does
+    not depend on how many positions are still possible.
+    """
+
+    def __init__(self, compiled):
+        self.compiled = compiled
+        self.rows, self.cols = compiled.rows, compiled.cols
+        self.size = self.rows * self.cols
+        self.full = (1 << self.size) - 1
+        self.free = self.mask(lambda cell: cell == ' ')
+        walls = self.mask(lambda cell: cell == 'X')
+        self.portal_mask = self.mask(lambda cell: cell == 'P')
+
+        row = (1 << self.cols) - 1
+        self.first_row = row
+        self.last_row = row << (self.size - self.cols)
+        self.first_col = sum(1 << (r * self.cols) for r in range(self.rows))
+        self.last_col = self.first_col << (self.cols - 1)
+
+        # Cells that do not move because the cell in that direction is a wall
+        self.blocked = {direction: self.shift(walls, self.opposite(direction)) & ~walls for direction in DIRECTIONS}
+
+    def mask(self, condition):
+        bits = 0
+        for index, cell in enumerate(self.compiled.cells):
+            if condition(cell):
+                bits |= 1 << index
+        return bits
+
+    def opposite(self, direction):
+        return {'N': 'S', 'S': 'N', 'W': 'E', 'E': 'W'}[direction]
+
+    def shift(self, bits, direction):
+        # Moves every bit one cell in direction, wrapping around the map edges
+        if direction == 'N':
+            return (bits >> self.cols) | ((bits & self.first_row) << (self.size - self.cols))
+        if direction == 'S':
+            return ((bits & ~self.last_row) << self.cols) | ((bits & self.last_row) >> (self.size - self.cols))
+        if direction == 'E':
+            return ((bits & ~self.last_col) << 1) | ((bits & self.last_col) >> (self.cols - 1))
+        return ((bits & ~self.first_col) >> 1) | ((bits & self.first_col) << (self.cols - 1))
+
+    def move(self, bits, direction):
+        blocked = self.blocked[direction]
+        landed = self.shift(bits & ~blocked, direction)
+        portals = landed & self.portal_mask
+        if portals:
+            landed &= ~self.portal_mask
+            for portal in cells_of(portals):
+                landed |= 1 << self.compiled.partner[portal]
+        return (bits & blocked) | landed
+
+    def shrinking_word(self, bits, depth):
+        # Breadth-first over words of up to depth moves; returns the word of the first
+        # length that makes the set smaller, preferring the smallest resulting set
+        size = count_cells(bits)
+        level = [(bits, '')]
+        seen = {bits}
+        for _ in range(depth):
+            next_level = []
+            best = None
+            for state, word in level:
+                for direction in DIRECTIONS:
+                    moved = self.move(state, direction)
+                    if moved in seen:
+                        continue
+                    seen.add(moved)
+                    next_level.append((moved, word + direction))
+                    moved_size = count_cells(moved)
+                    if moved_size < size and (best is None or moved_size < best[0]):
+                        best = (moved_size, word + direction)
+            if best is not None:
+                return best[1]
+            level = next_level
+        return None
+
+    def pushing_word(self, bits):
+        # Longer words of the form d1...d1 d2...d2 that push the robot against walls.
+        # Each run stops as soon as the set shrinks or stops changing.
+        size = count_cells(bits)
+        limit = self.rows + self.cols
+        best = None
+        for first in DIRECTIONS:
+            for second in [None] + [direction for direction in DIRECTIONS if direction != first]:
+                state, word = bits, ''
+                for direction in (first, second):
+                    if direction is None:
+                        continue
+                    for _ in range(limit):
+                        moved = self.move(state, direction)
+                        if moved == state:
+                            break
+                        state, word = moved, word + direction
+                        if count_cells(state) < size:
+                            break
+                    if count_cells(state) < size:
+                        break
+                if count_cells(state) < size and (best is None or len(word) < len(best)):
+                    best = word
+        return best
+
+    def merging_word(self, first, second, max_states=200000):
+        # Shortest word that brings two positions together, searched over position pairs
+        parent = {(first, second): None}
+        queue = deque([(first, second)])
+        while queue and len(parent) < max_states:
+            pair = queue.popleft()
+            for direction, table in self.compiled.next.items():
+                moved = (table[pair[0]], table[pair[1]])
+                if moved in parent:
+                    continue
+                parent[moved] = (pair, direction)
+                if moved[0] == moved[1]:
+                    word = []
+                    while parent[moved] is not None:
+                        moved, direction = parent[moved]
+                        word.append(direction)
+                    return ''.join(reversed(word))
+                queue.append(moved)
+        return None
+
+    def path_between(self, source, target):
+        parent = {source: None}
+        queue = deque([source])
+        while queue and target not in parent:
+            cell = queue.popleft()
+            for direction, table in self.compiled.next.items():
+                if table[cell] not in parent:
+                    parent[table[cell]] = (cell, direction)
+                    queue.append(table[cell])
+        if target not in parent:
+            return None
+        path = []
+        while parent[target] is not None:
+            target, direction = parent[target]
+            path.append(direction)
+        return ''.join(reversed(path))
+
+    def chasing_word(self, first, second, rounds=32):
+        # Walks both positions along the shortest path from the first to the second one,
+        # again and again; walls in the way usually bring them together after a few rounds
+        word = []
+        for _ in range(rounds):
+            path = self.path_between(first, second)
+            if not path:
+                return None
+            for direction in path:
+                first = self.compiled.next[direction][first]
+                second = self.compiled.next[direction][second]
+            word.append(path)
+            if first == second:
+                return ''.join(word)
+        return None
+
+    def merging_fallback(self, bits, max_pairs=16):
+        # Tries a few pairs of possible positions until one of them can be merged
+        cells = cells_of(bits)
+        pairs = [(first, second) for k, first in enumerate(cells) for second in cells[k + 1:]][:max_pairs]
+        for first, second in pairs:
+            step = self.chasing_word(first, second)
+            if step is not None:
+                return step
+        for first, second in pairs:
+            step = self.merging_word(first, second)
+            if step is not None:
+                return step
+        return None
+
+    def synchronize(self, bits, depth=4):
+        """
+        Builds a word that shrinks the set of possible positions to a single cell.
+
+        Returns the word and the cells that are still possible afterwards. More than one
+        cell is left only if the map has no synchronizing word (e.g. it is symmetric).
+        """
+        word = []
+        while count_cells(bits) > 1:
+            step = self.shrinking_word(bits, depth)
+            if step is None:
+                step = self.pushing_word(bits)
+            if step is None:
+                step = self.merging_fallback(bits)
+            if step is None:
+                break
+            for direction in step:
+                bits = self.move(bits, direction)
+            word.append(step)
+        return ''.join(word), cells_of(bits)
@@ -1,103 +1,122 @@
-import glob  # Library for pattern matching files using Unix shell rules
+import mmap
+import os
+import sys
+from cleaning_grid import CleaningGrid, START
+from compiled_map import CompiledMap
+from plan_verifier import PlanVerifier
+from plan_lifting import LiftedPlan
 
 class Robot:
     def __init__(self, map):
-        self.map = map
-        self.rows = len(map)
-        self.cols = len(map[0])
-        self.cleaned = set()
-        self.directions = {'N': (-1, 0), 'S': (1, 0), 'W': (0, -1), 'E': (0, 1)}
+        self.compiled = CompiledMap(map)
+        self.rows = self.compiled.rows
+        self.cols = self.compiled.cols
+        self.grid = CleaningGrid(self.compiled)
 
     def find_starting_points(self):
-        possible_starting_points = []
-        for i in range(self.rows):
-            for j in range(self.cols):
-                if self.map[i][j] == 'S':
-                    return [(i, j)]
-                elif self.map[i][j] == ' ':
-                    possible_starting_points.append((i, j))
-        
+        start = self.grid.find(START)
+        if start != -1:
+            return [start]
+        possible_starting_points = self.grid.free_cells()
         if possible_starting_points:
             return possible_starting_points
         else:
             raise ValueError("No valid starting point found in the map.")
 
     def move(self, instruction, starting_point):
-        x, y = starting_point
-        if instruction in self.directions:
-            dx, dy = self.directions[instruction]
-            new_x = (x + dx) % self.rows
-            new_y = (y + dy) % self.cols
-            if self.map[new_x][new_y] != 'X':
-                if self.map[new_x][new_y] == 'P':
-                    for i in range(self.rows):
-                        for j in range(self.cols):
-                            if self.map[i][j] == 'P' and (i, j) != (new_x, new_y):
-                                new_x, new_y = i, j
-                                break
-                        else:
-                            continue
-                        break
-                starting_point = new_x, new_y
-                if self.map[new_x][new_y] == ' ':
-                    self.cleaned.add((new_x, new_y))
+        # starting_point is a cell index of the compiled map
+        if instruction in self.compiled.next:
+            starting_point = self.compiled.next[instruction][starting_point]
+            self.grid.clean(starting_point)
         return starting_point
 
     def count_uncleaned(self):
-        uncleaned = sum(row.count(' ') for row in self.map) - len(self.cleaned)
-        positions = [(i, j) for i in range(self.rows) for j in range(self.cols) if self.map[i][j] == ' ' and (i, j) not in self.cleaned]
-        positions.sort(key=lambda pos: (pos[1], pos[0]))
-        return uncleaned, positions
+        return self.grid.remaining, self.grid.uncleaned_positions()
 
 def case_simple_map(map, instructions):
     robot = Robot(map)
-    starting_points = robot.find_starting_points()
-    all_uncleaned_positions = []
-    for starting_point in starting_points:
-        current_point = starting_point
-        for instruction in instructions:
-            current_point = robot.move(instruction, current_point)
-        uncleaned, positions = robot.count_uncleaned()
-        all_uncleaned_positions.extend(positions)
-    return all_uncleaned_positions
+    verifier = PlanVerifier(robot.compiled, robot.find_starting_points())
+    return verifier.uncleaned_positions(instructions)
 
 def case_portal_known_starting_point(map, instructions, starting_point):
     robot = Robot(map)
-    all_uncleaned_positions = []
-    for instruction in instructions:
-        starting_point = robot.move(instruction, starting_point)
-    uncleaned, positions = robot.count_uncleaned()
-    all_uncleaned_positions.extend(positions)
-    return all_uncleaned_positions
+    verifier = PlanVerifier(robot.compiled, [starting_point])
+    return verifier.uncleaned_positions(instructions)
 
 def case_portal_unknown_starting_point(map, instructions):
+    # Every free cell is a possible start; the verifier moves all of them together
+    robot = Robot(map)
+    verifier = PlanVerifier(robot.compiled, robot.find_starting_points())
+    return verifier.uncleaned_positions(instructions)
+
+def case_belief_set(map, instructions):
+    # Moves every candidate start at once. belief maps a position to the bitset of
+    # starts that are currently there, so starts that meet are collapsed into one entry.
+    # covered maps a position to the bitset of starts that have already cleaned it.
     robot = Robot(map)
     starting_points = robot.find_starting_points()
-    all_uncleaned_positions = set()  # Using set to avoid duplicates
-    for starting_point in starting_points:
-        current_point = starting_point
-        robot.cleaned = set()  # Reset cleaned set for each starting point
-        for instruction in instructions:
-            current_point = robot.move(instruction, current_point)
-        uncleaned, positions = robot.count_uncleaned()
-        all_uncleaned_positions.update(positions)  # Update the set with new positions
-    return sorted(all_uncleaned_positions, key=lambda pos: (pos[1], pos[0]))
+    all_starts = (1 << len(starting_points)) - 1
+    belief = {point: 1 << k for k, point in enumerate(starting_points)}
+    covered = dict(belief)  # The robot cleans the cell it starts on
+    for instruction in instructions:
+        if instruction not in robot.compiled.next:
+            continue
+        step = robot.compiled.next[instruction]
+        next_belief = {}
+        for point, starts in belief.items():
+            point = step[point]
+            next_belief[point] = next_belief.get(point, 0) | starts
+            covered[point] = covered.get(point, 0) | starts
+        belief = next_belief
 
-def process_file(input_path, output_path):
-    with open(input_path, 'r') as f:
-        lines = f.readlines()
-        lines = [line.strip() for line in lines[1:] if line.strip()]
-        instructions = lines[0]
-        map = lines[1:]
+    for point, starts in covered.items():
+        if starts == all_starts:
+            robot.grid.clean(point)
+    return robot.grid.uncleaned_positions()
 
-    if 'S' in ''.join(map):
-        starting_point = [(i, j) for i in range(len(map)) for j in range(len(map[0])) if map[i][j] == 'S'][0]
-        if 'P' in ''.join(map):
-            all_uncleaned_positions = case_portal_known_starting_point(map, instructions, starting_point)
-        else:
-            all_uncleaned_positions = case_simple_map(map, instructions)
-    else:
-        all_uncleaned_positions = case_portal_unknown_starting_point(map, instructions)
+def case_compressed_plan(map, instructions):
+    # Plans such as '(NNEE)x5000' are lifted instead of expanded move by move
+    robot = Robot(map)
+    plan = LiftedPlan(robot.compiled, robot.find_starting_points())
+    return plan.uncleaned_positions(instructions)
+
+def instruction_span(data):
+    # Start and end offset of the instruction line, the first non-empty line after the
+    # header. Only short lines are copied to check whether they are blank.
+    start = data.find(b'\n') + 1
+    while start < len(data):
+        end = data.find(b'\n', start)
+        if end == -1:
+            end = len(data)
+        if end - start > 64 or data[start:end].strip():
+            return start, end
+        start = end + 1
+    return start, start
+
+def process_file(input_path, output_path, engine='numpy'):
+    # engine='belief' checks unknown starts with the pure Python belief-set simulation,
+    # engine='lifting' (picked automatically for run-length compressed plans) checks them without expanding.
+    # The file is memory-mapped and the NumPy engines read the instructions from it in chunks.
+    with open(input_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        start, end = instruction_span(data)
+        map = [line.strip() for line in data[end:].decode('ascii').splitlines() if line.strip()]
+        compressed = data.find(b'(', start, end) != -1
+        instructions = memoryview(data)[start:end]
+        try:
+            if engine == 'lifting' or compressed:
+                all_uncleaned_positions = case_compressed_plan(map, bytes(instructions).decode('ascii'))
+            elif 'S' in ''.join(map):
+                starting_point = ''.join(map).index('S')
+                if 'P' in ''.join(map):
+                    all_uncleaned_positions = case_portal_known_starting_point(map, instructions, starting_point)
+                else:
+                    all_uncleaned_positions = case_simple_map(map, instructions)
+            elif engine == 'belief':
+                all_uncleaned_positions = case_belief_set(map, bytes(instructions).decode('ascii'))
+            else:
+                all_uncleaned_positions = case_portal_unknown_starting_point(map, instructions)
+        finally:
+            instructions.release()
 
     with open(output_path, 'w') as output_file:
         if all_uncleaned_positions:
@@ -106,26 +125,14 @@ def process_file(input_path, output_path):
                 output_file.write(f"{position[1]}, {position[0]}\n")
         else:
             output_file.write("GOOD PLAN\n")
-def main():
-    input_files = glob.glob('C:/Users/rider/Desktop/MsAI/Projects/AISys1/ca39rapa-1/Assignment1.0/problems/problem_*.txt')
-    
-    # Organizing based on cases
-    case1_files = input_files[:20]
-    case2_files = input_files[20:40]
-    case3_files = input_files[40:60]
 
-    # Processing files for each case
-    for input_path in case1_files:
-        output_path = input_path.replace('problems', 'solutions').replace('problem_', 'solution_')
-        process_file(input_path, output_path)
-
-    for input_path in case2_files:
-        output_path = input_path.replace('problems', 'solutions').replace('problem_', 'solution_')
-        process_file(input_path, output_path)
-
-    for input_path in case3_files:
-        output_path = input_path.replace('problems', 'solutions').replace('problem_', 'solution_')
-        process_file(input_path, output_path)
+def main():
+    # Input and output directories default to the problems/solutions folders next to this script
+    from batch_runner import run_batch  # Imported here because batch_runner imports this module
+    here = os.path.dirname(os.path.abspath(__file__))
+    input_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join(here, 'problems')
+    output_dir = sys.argv[2] if len(sys.argv) > 2 else os.path.join(here, 'solutions')
+    run_batch(input_dir, output_dir, case='CHECK PLAN')
 
 if __name__ == '__main__':
     main()
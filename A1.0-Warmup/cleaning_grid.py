@@ -0,0 +1,50 @@
+# Cell codes of the grid, one byte per cell. Any other character is passable but never dirty.
+FREE, WALL, PORTAL, START, OTHER = 0, 1, 2, 3, 4
+CODES = {' ': FREE, 'X': WALL, 'P': PORTAL, 'S': START}
+
+class CleaningGrid:
+    """
+    Cleaning state of a map, shared by both robots.
+
+    codes holds one byte per cell (row by row, like CompiledMap) and dirty is a bitmap
+    with one byte per cell. remaining counts the dirty cells and is kept up to date by
+    clean(), so the number of uncleaned cells is known without scanning the map.
+    """
+
+    def __init__(self, compiled):
+        self.compiled = compiled
+        self.codes = bytearray(CODES.get(cell, OTHER) for cell in compiled.cells)
+        self.dirty = bytearray(code == FREE for code in self.codes)
+        self.remaining = sum(self.dirty)
+
+    def find(self, code):
+        # Index of the first cell with this code, or -1
+        return self.codes.find(code)
+
+    def free_cells(self):
+        return [index for index, code in enumerate(self.codes) if code == FREE]
+
+    def clean(self, index):
+        if self.dirty[index]:
+            self.dirty[index] = 0
+            self.remaining -= 1
+            return True
+        return False
+
+    def copy(self):
+        grid = CleaningGrid.__new__(CleaningGrid)
+        grid.compiled = self.compiled
+        grid.codes = self.codes
+        grid.dirty = bytearray(self.dirty)
+        grid.remaining = self.remaining
+        return grid
+
+    def uncleaned_positions(self):
+        # (row, col) of every dirty cell, sorted by column and then row
+        positions = []
+        index = self.dirty.find(1)
+        while index != -1:
+            positions.append(self.compiled.position(index))
+            index = self.dirty.find(1, index + 1)
+        positions.sort(key=lambda pos: (pos[1], pos[0]))
+        return positions
@@ -0,0 +1,46 @@
+from array import array
+
+DIRECTIONS = {'N': (-1, 0), 'S': (1, 0), 'W': (0, -1), 'E': (0, 1)}
+
+class CompiledMap:
+    """
+    Flat version of a cave map that is built once per map.
+
+    Cells are numbered row by row (index = row * cols + col). For every direction,
+    next[direction][index] is the cell the robot ends up on after moving from index,
+    with wraparound, walls and portals already resolved, so a move is a single lookup.
+    The tables are int arrays (4 bytes per entry) rather than lists of Python ints.
+    """
+
+    def __init__(self, map):
+        self.rows = len(map)
+        self.cols = len(map[0])
+        self.cells = ''.join(map)
+        self.portals = [index for index, cell in enumerate(self.cells) if cell == 'P']
+        self.partner = self.find_partners()
+        self.next = {direction: self.compile_direction(dx, dy) for direction, (dx, dy) in DIRECTIONS.items()}
+
+    def find_partners(self):
+        # Stepping onto a portal moves the robot to the first other portal of the map
+        partner = {}
+        for portal in self.portals:
+            partner[portal] = next((other for other in self.portals if other != portal), portal)
+        return partner
+
+    def compile_direction(self, dx, dy):
+        table = array('i')
+        for index in range(self.rows * self.cols):
+            x, y = divmod(index, self.cols)
+            target = ((x + dx) % self.rows) * self.cols + (y + dy) % self.cols
+            if self.cells[target] == 'X':
+                target = index
+            elif self.cells[target] == 'P':
+                target = self.partner[target]
+            table.append(target)
+        return table
+
+    def index(self, x, y):
+        return x * self.cols + y
+
+    def position(self, index):
+        return divmod(index, self.cols)
@@ -1,101 +1,193 @@
+from array import array
 from collections import deque
-import random
+import heapq
+import os
+import sys
+from belief_space import BeliefSpace
+from cleaning_grid import CleaningGrid, START
+from compiled_map import CompiledMap
+from tour_planner import TourPlanner
 
 class Robot:
     def __init__(self, map):
-        self.map = [list(row) for row in map]
         self.directions = {'N': (-1, 0), 'S': (1, 0), 'E': (0, 1), 'W': (0, -1)}
+        self.compiled = CompiledMap(map)
+        self.grid = CleaningGrid(self.compiled)
         self.start = self.find_start()
-        self.portals = self.find_portals()
         self.instructions = []
-    
+
+        # Search state is preallocated once and reused by every search. A cell's entries
+        # are only valid while its stamp equals the stamp of the current search.
+        # parent_direction holds the byte of the direction letter.
+        size = self.compiled.rows * self.compiled.cols
+        self.stamp = array('i', [0]) * size
+        self.current_stamp = 0
+        self.cost = array('i', [0]) * size
+        self.parent = array('i', [-1]) * size
+        self.parent_direction = bytearray(size)
+        self.distance = None
+
     def find_start(self):
-        start_positions = []
-        for i in range(len(self.map)):
-            for j in range(len(self.map[0])):
-                if self.map[i][j] == 'S':
-                    return (i, j)
-                elif self.map[i][j] == ' ':
-                    start_positions.append((i, j))
-        
-        # If there is no explicit starting point, choose randomly from available empty spaces
-        if start_positions:
-            return random.choice(start_positions)
+        start = self.grid.find(START)
+        if start != -1:
+            return self.compiled.position(start)
+
+        # Without an explicit starting point the start is unknown; localize() finds
+        # moves that bring the robot to a known cell before cleaning starts
+        if self.grid.remaining:
+            return None
         else:
             raise ValueError("No starting point ('S') or empty spaces ('.') found in the map.")
 
-    def find_portals(self):
-        portals = []
-        for i in range(len(self.map)):
-            for j in range(len(self.map[0])):
-                if self.map[i][j] == 'P':
-                    portals.append((i, j))
-        return portals
-    
-    def bfs(self, start):
-        queue = deque([(start, [])])
-        visited = set()
-        visited.add(start)
-        
+    def starting_cell(self):
+        if self.start is None:
+            self.localize()
+        return self.compiled.index(*self.start)
+
+    def localize(self):
+        # The set of possible positions is shrunk with a synchronizing word. Which cells
+        # were cleaned on the way depends on the unknown start, so cleaning is planned
+        # from the final cell as if nothing had been cleaned yet.
+        belief = BeliefSpace(self.compiled)
+        word, candidates = belief.synchronize(belief.free)
+        self.instructions.extend(word)
+        if len(candidates) == 1:
+            self.start = self.compiled.position(candidates[0])
+            return
+
+        # The map has no synchronizing word, so the robot cleans the map once for each
+        # cell it may be on. Every candidate follows the same instructions.
+        positions = list(candidates)
+        grids = [self.grid.copy() for _ in candidates]
+        for candidate in range(len(candidates)):
+            self.start = self.compiled.position(positions[candidate])
+            self.grid = grids[candidate]
+            first = len(self.instructions)
+            self.clean_tour()
+            for direction in self.instructions[first:]:
+                for other in range(len(positions)):
+                    positions[other] = self.compiled.next[direction][positions[other]]
+                    grids[other].clean(positions[other])
+        self.start = self.compiled.position(positions[-1])
+
+    def path_to(self, cell):
+        # Follows the parent pointers of the last search back to its start
+        path = []
+        while self.parent[cell] != -1:
+            path.append(chr(self.parent_direction[cell]))
+            cell = self.parent[cell]
+        path.reverse()
+        return path
+
+    def distances_to_dirty(self):
+        # Multi-source BFS backwards from every dirty cell
+        size = len(self.grid.dirty)
+        predecessors = [[] for _ in range(size)]
+        for table in self.compiled.next.values():
+            for cell, next_cell in enumerate(table):
+                if next_cell != cell:
+                    predecessors[next_cell].append(cell)
+        distance = array('i', [size]) * size  # size works as infinity, no path is that long
+        queue = deque(cell for cell in range(size) if self.grid.dirty[cell])
+        for cell in queue:
+            distance[cell] = 0
         while queue:
-            (x, y), path = queue.popleft()
-            
-            for direction, (dx, dy) in self.directions.items():
-                nx, ny = x + dx, y + dy
-                
-                if 0 <= nx < len(self.map) and 0 <= ny < len(self.map[0]) and (nx, ny) not in visited:
-                    if self.map[nx][ny] == ' ':
-                        return (nx, ny), path + [direction]
-                    elif self.map[nx][ny] == 'S' or self.map[nx][ny] == '.':
-                        visited.add((nx, ny))
-                        queue.append(((nx, ny), path + [direction]))
-                    elif self.map[nx][ny] == 'P':
-                        visited.add((nx, ny))
-                        for portal in self.portals:
-                            if portal != (nx, ny) and portal not in visited:
-                                queue.append((portal, path + [direction]))
-                                visited.add(portal)                            
-        return None, []
+            cell = queue.popleft()
+            for previous in predecessors[cell]:
+                if distance[previous] == size:
+                    distance[previous] = distance[cell] + 1
+                    queue.append(previous)
+        return distance
+
+    def search_nearest_dirty(self, start):
+        # A* towards the nearest dirty cell. self.distance is the distance field of an
+        # earlier state of the map. Cells only ever get cleaned, so the old distances are
+        # still lower bounds and make an admissible heuristic. After each search the
+        # field is repaired for the cells that were expanded (Adaptive A*), so later
+        # searches start from a sharper field instead of from scratch.
+        distance = self.distance
+        self.current_stamp += 1
+        stamp = self.current_stamp
+        self.stamp[start] = stamp
+        self.cost[start] = 0
+        self.parent[start] = -1
+        heap = [(distance[start], 0, start)]
+        expanded = []
+
+        while heap:
+            _, negative_cost, cell = heapq.heappop(heap)
+            if -negative_cost != self.cost[cell]:
+                continue  # A shorter way to this cell was found after it was queued
+            if self.grid.dirty[cell] and cell != start:
+                goal_cost = self.cost[cell]
+                for closed in expanded:
+                    distance[closed] = max(distance[closed], goal_cost - self.cost[closed])
+                return cell
+            expanded.append(cell)
+            cost = self.cost[cell] + 1
+            for direction in self.directions:
+                next_cell = self.compiled.next[direction][cell]
+                if self.stamp[next_cell] == stamp and self.cost[next_cell] <= cost:
+                    continue
+                self.stamp[next_cell] = stamp
+                self.cost[next_cell] = cost
+                self.parent[next_cell] = cell
+                self.parent_direction[next_cell] = ord(direction)
+                heapq.heappush(heap, (cost + distance[next_cell], -cost, next_cell))
+        return None
 
     def clean(self):
-        current_pos = self.start
-        
-        while True:
-            new_pos, new_path = self.bfs(current_pos)
-            if not new_path:
-                break
-            
-            self.instructions.extend(new_path)
-            current_pos = new_pos
-            self.map[current_pos[0]][current_pos[1]] = '.'  # Mark as cleaned
-        
+        current = self.starting_cell()
+        self.grid.clean(current)  # The robot cleans the cell it starts on
+        self.distance = self.distances_to_dirty()
+
+        while self.grid.remaining:
+            target = self.search_nearest_dirty(current)
+            if target is None:
+                break  # The dirty cells left cannot be reached from current
+            path = self.path_to(target)
+            for direction in path:
+                current = self.compiled.next[direction][current]
+                self.grid.clean(current)
+            self.instructions.extend(path)
+
+        return ''.join(self.instructions)
+
+    def clean_tour(self, max_cells=1000, time_limit=1.0):
+        # Plans the visiting order of all dirty cells at once instead of greedily.
+        # The distance matrix grows quadratically, so big maps use the greedy clean().
+        start = self.starting_cell()
+        dirty_cells = [cell for cell, value in enumerate(self.grid.dirty) if value and cell != start]
+        if len(dirty_cells) > max_cells:
+            return self.clean()
+        planner = TourPlanner(self.compiled, start, dirty_cells, time_limit=time_limit)
+        path = planner.instructions()
+        current = start
+        self.grid.clean(current)
+        for direction in path:
+            current = self.compiled.next[direction][current]
+            self.grid.clean(current)
+        self.instructions.extend(path)
         return ''.join(self.instructions)
 
 def process_file(input_filename, output_filename):
     with open(input_filename, 'r') as f:
         lines = f.readlines()[1:]  # Ignore the first line
-        map = [line.strip() for line in lines]
-    
+        map = [line.strip() for line in lines if line.strip()]
+
     robot = Robot(map)
-    solution = robot.clean()
-    
+    solution = robot.clean_tour()
+
     with open(output_filename, 'w') as f:
         f.write(solution)
 
-# Process 20 input files
-for i in range(20):
-    input_filename = f"C:/Users/rider/Desktop/MsAI/Projects/AISys1/ca39rapa-1/Assignment1.0/problems/problem_d_{i:02}.txt"
-    output_filename = f"C:/Users/rider/Desktop/MsAI/Projects/AISys1/ca39rapa-1/Assignment1.0/solutions/solution_d_{i:02}.txt"
-    process_file(input_filename, output_filename)
-
-# Processing the second set of problem files (problem_e_00.txt to problem_e_19.txt)
-for i in range(20):
-    input_filename_e = f"C:/Users/rider/Desktop/MsAI/Projects/AISys1/ca39rapa-1/Assignment1.0/problems/problem_e_{i:02}.txt"
-    output_filename_e = f"C:/Users/rider/Desktop/MsAI/Projects/AISys1/ca39rapa-1/Assignment1.0/solutions/solution_e_{i:02}.txt"
-    process_file(input_filename_e, output_filename_e)
-
-# Processing the second set of problem files (problem_f_00.txt to problem_f_19.txt)
-for i in range(20):
-    input_filename_f = f"C:/Users/rider/Desktop/MsAI/Projects/AISys1/ca39rapa-1/Assignment1.0/problems/problem_f_{i:02}.txt"
-    output_filename_f = f"C:/Users/rider/Desktop/MsAI/Projects/AISys1/ca39rapa-1/Assignment1.0/solutions/solution_f_{i:02}.txt"
-    process_file(input_filename_f, output_filename_f)
\ No newline at end of file
+def main():
+    # Input and output directories default to the problems/solutions folders next to this script
+    from batch_runner import run_batch  # Imported here because batch_runner imports this module
+    here = os.path.dirname(os.path.abspath(__file__))
+    input_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join(here, 'problems')
+    output_dir = sys.argv[2] if len(sys.argv) > 2 else os.path.join(here, 'solutions')
+    run_batch(input_dir, output_dir, case='FIND PLAN')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+import re
+import numpy as np
+from compiled_map import DIRECTIONS
+from plan_verifier import PlanVerifier, encode_instructions
+
+TOKEN = re.compile(r'\s*(?:(?P<letters>[NSEW]+)|(?P<open>\()|(?P<close>\))\s*x\s*(?P<count>\d+))')
+
+def parse_plan(text):
+    """
+    Parses a run-length compressed plan such as 'S(NNEE)x5000W' or '((NE)x3S)x10'.
+
+    Returns a list whose items are either a string of moves or a (block, count) pair,
+    where block is again such a list.
+    """
+    stack = [[]]
+    position = 0
+    text = text.strip()
+    while position < len(text):
+        match = TOKEN.match(text, position)
+        if not match:
+            raise ValueError(f"Invalid plan syntax at position {position}: {text[position:position + 20]!r}")
+        position = match.end()
+        if match.group('letters'):
+            stack[-1].append(match.group('letters'))
+        elif match.group('open'):
+            stack.append([])
+        else:
+            if len(stack) == 1:
+                raise ValueError(f"Unmatched ')' at position {match.start('close')}")
+            block = stack.pop()
+            stack[-1].append((block, int(match.group('count'))))
+    if len(stack) != 1:
+        raise ValueError("Unmatched '(' in plan")
+    return stack[0]
+
+class LiftedPlan:
+    """
+    Evaluates a compressed plan without expanding it.
+
+    The plan is lifted into a short sequence of move codes and jump codes, which
+    PlanVerifier then checks for the starts like any other plan. A block repeated k
+    times is only walked until every cell the starts can be on has gone round its
+    cycle under the block's position map; the remaining repetitions only revisit cells
+    the robot has already cleaned and become one jump. A jump is the position map of
+    those repetitions, built by repeated squaring, so '(NNEE)x5000' costs about
+    log2(5000) compositions. Coverage is only tracked for the starts, by the verifier.
+    """
+
+    def __init__(self, compiled, starting_points):
+        self.compiled = compiled
+        self.starting_points = np.unique(np.asarray(starting_points, dtype=np.int64))
+        self.table = np.array([compiled.next[direction] for direction in DIRECTIONS], dtype=np.int64)
+        self.maps = {}  # id(item) -> cell the robot ends on after the item, for every cell
+        self.jumps = []  # Position map of jump code len(DIRECTIONS) + k
+        self.jump_codes = {}  # (id(block), repetitions) -> jump code
+
+    def position_map(self, item):
+        key = id(item)
+        if key not in self.maps:
+            if isinstance(item, str):
+                result = np.arange(len(self.compiled.cells))
+                for direction in encode_instructions(item).tolist():
+                    result = self.table[direction][result]
+            elif isinstance(item, list):
+                result = np.arange(len(self.compiled.cells))
+                for part in item:
+                    result = self.position_map(part)[result]
+            else:
+                block, count = item
+                result = self.power(self.position_map(block), count)
+            self.maps[key] = result
+        return self.maps[key]
+
+    def power(self, target, count):
+        # target applied count times, by repeated squaring
+        result = np.arange(len(target))
+        while count:
+            if count & 1:
+                result = target[result]
+            count >>= 1
+            if count:
+                target = target[target]
+        return result
+
+    def cycle_bound(self, target, positions, limit):
+        # Number of applications of target after which every position has been all the
+        # way round its cycle: twice the step at which Floyd's tortoise and hare meet.
+        # The walk stops once the bound reaches limit.
+        slow, fast = target[positions], target[target[positions]]
+        steps = 1
+        while 2 * steps < limit:
+            moving = slow != fast
+            if not moving.any():
+                break
+            slow, fast = target[slow[moving]], target[target[fast[moving]]]
+            steps += 1
+        return 2 * steps
+
+    def jump(self, block, count):
+        key = (id(block), count)
+        if key not in self.jump_codes:
+            self.jump_codes[key] = len(DIRECTIONS) + len(self.jumps)
+            self.jumps.append(self.power(self.position_map(block), count))
+        return self.jump_codes[key]
+
+    def lift(self, item, positions, codes):
+        """
+        Appends the codes of item to codes. positions are the distinct cells the starts
+        can be on before item; returns those after it.
+        """
+        if isinstance(item, str):
+            codes.append(encode_instructions(item))
+            return np.unique(self.position_map(item)[positions])
+        if isinstance(item, list):
+            for part in item:
+                positions = self.lift(part, positions, codes)
+            return positions
+
+        block, count = item
+        walked = count
+        if count > 2:
+            # Rounded up to a power of two so that a block needs few different jumps
+            bound = self.cycle_bound(self.position_map(block), positions, count)
+            walked = min(count, 1 << (bound - 1).bit_length())
+        if all(isinstance(part, str) for part in block):
+            # Every repetition of a block without inner blocks has the same codes
+            codes.append(np.tile(encode_instructions(''.join(block)), walked))
+            target = self.position_map(block)
+            for _ in range(walked):
+                positions = target[positions]
+            positions = np.unique(positions)
+        else:
+            for _ in range(walked):
+                positions = self.lift(block, positions, codes)
+        if walked < count:
+            code = self.jump(block, count - walked)
+            codes.append(np.array([code], dtype=np.int32))
+            positions = np.unique(self.jumps[code - len(DIRECTIONS)][positions])
+        return positions
+
+    def uncleaned_positions(self, text):
+        plan = parse_plan(text)
+        self.maps, self.jumps, self.jump_codes = {}, [], {}  # Keys hold ids of the items of this plan
+        codes = [np.empty(0, dtype=np.int32)]
+        self.lift(plan, self.starting_points, codes)
+        verifier = PlanVerifier(self.compiled, self.starting_points, jumps=self.jumps)
+        return verifier.uncleaned_positions(np.concatenate(codes))
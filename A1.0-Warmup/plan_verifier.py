@@ -0,0 +1,264 @@
+import numpy as np
+from cleaning_grid import CleaningGrid
+from compiled_map import DIRECTIONS
+
+# Byte value of an instruction -> row of the transition table (-1 for anything that is not a move)
+DIRECTION_CODES = np.full(256, -1, dtype=np.int8)
+for code, direction in enumerate(DIRECTIONS):
+    DIRECTION_CODES[ord(direction)] = code
+BITS = (1 << np.arange(8)).astype(np.uint8)  # Bit of each of the eight cells packed into a byte
+SAMPLE_BLOCK = 4096  # Steps of the sample walks recorded before they are marked
+
+def encode_instructions(instructions):
+    if isinstance(instructions, np.ndarray):
+        return instructions  # Already codes, such as a plan lifted by LiftedPlan
+    if isinstance(instructions, str):
+        instructions = instructions.encode('ascii', 'ignore')
+    codes = DIRECTION_CODES[np.frombuffer(instructions, dtype=np.uint8)]
+    return codes[codes >= 0]
+
+def iter_directions(instructions, chunk_size):
+    # instructions is a str, bytes or a memoryview of a memory-mapped file; only one
+    # chunk of it is encoded at a time
+    for first in range(0, len(instructions), chunk_size):
+        yield encode_instructions(instructions[first:first + chunk_size])
+
+class PlanVerifier:
+    """
+    Checks a plan for many starting points at once with NumPy.
+
+    The plan is read in chunks of chunk_size instructions, so it can be a memoryview of
+    a memory-mapped file that never has to fit in memory as a whole. The check runs in
+    two passes over the plan:
+
+    1. Only the set of possible positions is moved (one gather per instruction) to find
+       the step at which all starts have met. From there on every start follows the same
+       walk, so cells visited after that step are clean for every start. The walk stops
+       early once every free cell has been visited.
+    2. The remaining candidate cells are checked with a bit-packed coverage matrix
+       (rows x candidate cells) over the steps before that point. Rows on the same cell
+       share their future and are merged by AND-ing their coverage: a cell is only safe
+       for the merged row if every start in it has cleaned it. The first pass also
+       gives the first step at which few enough positions are left for the matrix to
+       stay below max_matrix_size bits. Up to that step the starts are moved in chunks,
+       then the rows of all chunks are merged by position and go on together.
+    """
+
+    def __init__(self, compiled, starting_points, max_matrix_size=1 << 29, merge_every=16, sample_size=64,
+                 chunk_size=1 << 22, jumps=()):
+        # jumps are extra position maps over all cells, used as codes len(DIRECTIONS) + k
+        self.compiled = compiled
+        self.starting_points = np.unique(np.asarray(starting_points, dtype=np.int64))
+        self.max_matrix_size = max_matrix_size
+        self.merge_every = merge_every
+        self.sample_size = sample_size
+        self.chunk_size = chunk_size
+        self.table = np.array([compiled.next[direction] for direction in DIRECTIONS] + list(jumps), dtype=np.int64)
+        self.free = np.frombuffer(compiled.cells.encode('ascii'), dtype=np.uint8) == ord(' ')
+        self.seen = np.zeros(len(self.free), dtype=bool)  # Scratch buffer of distinct()
+
+    def uncleaned_mask(self, instructions):
+        meeting_step, grid, counts = self.find_meeting_point(instructions)
+        if grid is None:
+            candidates = self.free.copy()
+        else:
+            candidates = self.free & np.frombuffer(bytes(grid.dirty), dtype=bool)
+
+        # A few sample starts usually miss most cells of a bad plan. Those cells are
+        # known to be uncleaned and do not need a column in the full check.
+        uncleaned = np.zeros(len(self.free), dtype=bool)
+        columns = np.flatnonzero(candidates)
+        if len(columns) == 0:
+            return uncleaned
+        samples = self.starting_points[::max(1, len(self.starting_points) // self.sample_size)]
+        uncleaned[columns] = self.run_samples(samples, instructions, meeting_step, columns)
+
+        columns = np.flatnonzero(candidates & ~uncleaned)
+        if len(columns) == 0:
+            return uncleaned
+        # Half of the matrix holds a chunk of starts, the other half the rows they are merged into
+        max_rows = max(1, self.max_matrix_size // len(columns) // 2)
+        split = next((step for step, count in counts if count <= max_rows), meeting_step)
+        positions, covered = self.merge_chunks(instructions, split, meeting_step, columns, max_rows)
+        positions, covered = self.run_rows(positions, covered, instructions, split, meeting_step, columns)
+        uncleaned[columns] = ~self.all_covered(covered, len(columns))
+        return uncleaned
+
+    def find_meeting_point(self, instructions):
+        # Returns the meeting step, a CleaningGrid with the cells the common walk after
+        # it left dirty (None if the starts never meet) and (step, number of distinct
+        # positions) at the steps where the positions were merged
+        positions = self.starting_points
+        counts = [(0, len(positions))]
+        step = 0
+        grid = None
+        for directions in iter_directions(instructions, self.chunk_size):
+            offset = 0
+            if grid is None:
+                rows = list(self.table)
+                for direction in directions.tolist():
+                    if len(positions) <= self.sample_size:
+                        break
+                    positions = rows[direction].take(positions)
+                    offset += 1
+                    if (step + offset) % self.merge_every == 0:
+                        positions = self.distinct(positions)
+                        counts.append((step + offset, len(positions)))
+                if len(positions) <= self.sample_size:
+                    # A small set is cheaper to move and merge as a Python set
+                    table = self.table[:len(DIRECTIONS)].tolist()
+                    cells = set(positions.tolist())
+                    for direction in directions[offset:].tolist():
+                        if len(cells) == 1:
+                            break
+                        row = table[direction] if direction < len(table) else self.table[direction]
+                        cells = {row[cell] for cell in cells}
+                        offset += 1
+                    positions = np.array(sorted(cells), dtype=np.int64)
+                    counts.append((step + offset, len(positions)))
+                step += offset
+                if len(positions) > 1:
+                    continue
+                grid = CleaningGrid(self.compiled)
+                position = int(positions[0])
+                grid.clean(position)  # Every start is on this cell at the meeting step
+            position = self.walk(position, directions[offset:], grid)
+            if grid.remaining == 0:
+                break  # Every start has cleaned every cell; the rest of the plan does not matter
+        if grid is None and len(positions) == 1:
+            grid = CleaningGrid(self.compiled)
+            grid.clean(int(positions[0]))
+        return step, grid, counts
+
+    def distinct(self, positions):
+        # Sorted distinct positions, by sorting a small set and by marking cells for a large one
+        if len(positions) < len(self.seen) // 64:
+            positions = np.sort(positions)
+            return positions[np.r_[True, positions[1:] != positions[:-1]]]
+        self.seen[positions] = True
+        positions = np.flatnonzero(self.seen)
+        self.seen[positions] = False
+        return positions
+
+    def walk(self, position, directions, grid):
+        # A single walk is cheaper with Python lists than with one NumPy call per step
+        table = self.table[:len(DIRECTIONS)].tolist()
+        for direction in directions.tolist():
+            position = table[direction][position] if direction < len(table) else int(self.table[direction, position])
+            grid.clean(position)
+            if grid.remaining == 0:
+                break
+        return position
+
+    def run_samples(self, positions, instructions, steps, columns):
+        """
+        Same result as run_chunk for a few rows. With so few rows the per-call overhead
+        of NumPy dominates, so each step is a single take into a block of the trajectory
+        and the block is marked as covered with one assignment.
+        """
+        rows = list(self.table)
+        column_of = self.column_map(columns)
+        covered = np.zeros((len(positions), len(columns) + 1), dtype=bool)
+        sample = np.arange(len(positions))
+        covered[sample, column_of[positions]] = True  # The robot cleans the cell it starts on
+        step = 0
+        for directions in iter_directions(instructions, self.chunk_size):
+            directions = directions[:steps - step].tolist()
+            for first in range(0, len(directions), SAMPLE_BLOCK):
+                block = directions[first:first + SAMPLE_BLOCK]
+                trajectory = np.empty((len(block), len(positions)), dtype=np.int64)
+                for k, direction in enumerate(block):
+                    positions = rows[direction].take(positions, out=trajectory[k])
+                covered[sample, column_of[trajectory]] = True
+            step += len(directions)
+            if step >= steps or covered[:, :-1].all():
+                break
+        return ~covered[:, :-1].all(axis=0)
+
+    def column_map(self, columns):
+        # Column of every cell; the cells that are not candidates go to a spare column after the last
+        column_of = np.full(len(self.free), len(columns), dtype=np.int64)
+        column_of[columns] = np.arange(len(columns))
+        return column_of
+
+    def merge_chunks(self, instructions, split, steps, columns, max_rows):
+        """
+        Moves the starts with their coverage to step split in chunks of max_rows rows
+        and merges the rows of all chunks by their position at that step, so that only
+        the walk up to split is repeated per chunk. split is a step at which the
+        positions-only pass found at most max_rows distinct positions, or steps: after
+        that the positions no longer matter and all rows are merged into one.
+        """
+        cell_bits = self.cell_bits(columns)
+        width = (len(columns) + 64) // 64 * 8  # With the spare column, in whole 64-bit words to AND rows as uint64
+        positions = np.empty(0, dtype=np.int64)
+        covered = np.full((max_rows, width), 0xff, dtype=np.uint8)
+        row_of = np.full(len(self.free), -1, dtype=np.int64)
+        buffer = np.empty((min(max_rows, len(self.starting_points)), width), dtype=np.uint8)
+        for first in range(0, len(self.starting_points), max_rows):
+            chunk = self.starting_points[first:first + max_rows]
+            chunk_covered = buffer[:len(chunk)]
+            chunk_covered.fill(0)
+            self.mark(chunk_covered, chunk, cell_bits)  # The robot cleans the cell it starts on
+            chunk, chunk_covered = self.run_rows(chunk, chunk_covered, instructions, 0, split, columns)
+            if self.all_covered(chunk_covered, len(columns)).all():
+                continue  # Every start of the chunk cleans every candidate, nothing to merge
+            if split == steps:
+                chunk = np.zeros_like(chunk)
+            chunk, chunk_covered = self.merge(chunk, chunk_covered, force=True)
+            new = chunk[row_of[chunk] < 0]
+            row_of[new] = np.arange(len(positions), len(positions) + len(new))
+            positions = np.concatenate((positions, new))
+            covered[row_of[chunk]] &= chunk_covered
+        return positions, covered[:len(positions)]
+
+    def run_rows(self, positions, covered, instructions, first, last, columns):
+        # Moves the rows from step first to step last, marking the cells they clean
+        cell_bits = self.cell_bits(columns)
+        rows = list(self.table)
+        step = 0
+        for directions in iter_directions(instructions, self.chunk_size):
+            start, step = step, step + len(directions)
+            if step <= first:
+                continue
+            for k, direction in enumerate(directions[max(0, first - start):last - start].tolist(),
+                                          start=max(first, start)):
+                positions = rows[direction].take(positions)
+                self.mark(covered, positions, cell_bits)
+                if len(positions) > 1 and k % self.merge_every == 0:
+                    positions, covered = self.merge(positions, covered)
+            if step >= last or self.all_covered(covered, len(columns)).all():
+                break
+        return positions, covered
+
+    def cell_bits(self, columns):
+        # Byte and bit of every cell in a packed coverage row
+        column_of = self.column_map(columns)
+        return column_of >> 3, BITS[column_of & 7]
+
+    def all_covered(self, covered, column_count):
+        # Candidate cells cleaned by every row
+        all_covered = np.bitwise_and.reduce(covered.view(np.uint64), axis=0).view(np.uint8)
+        return np.unpackbits(all_covered, count=column_count, bitorder='little').astype(bool)
+
+    def mark(self, covered, positions, cell_bits):
+        # Every row holds exactly one position, so the (row, byte) pairs never repeat
+        byte_of, bit_of = cell_bits
+        covered[np.arange(len(positions)), byte_of.take(positions)] |= bit_of.take(positions)
+
+    def merge(self, positions, covered, force=False):
+        # Rows on the same cell share their future: one row with the AND of their coverage
+        cells, groups = np.unique(positions, return_inverse=True)
+        if len(cells) == len(positions) or (not force and len(cells) > len(positions) // 4):
+            return positions, covered  # Not worth copying the matrix yet
+        if np.any(groups[1:] < groups[:-1]):
+            order = np.argsort(groups, kind='stable')
+            covered, groups = covered[order], groups[order]
+        offsets = np.searchsorted(groups, np.arange(len(cells)))
+        return cells, np.bitwise_and.reduceat(covered.view(np.uint64), offsets, axis=0).view(np.uint8)
+
+    def uncleaned_positions(self, instructions):
+        indices = np.flatnonzero(self.uncleaned_mask(instructions))
+        positions = [self.compiled.position(int(index)) for index in indices]
+        positions.sort(key=lambda pos: (pos[1], pos[0]))
+        return positions
@@ -0,0 +1,163 @@
+from collections import deque
+import time
+import numpy as np
+
+UNREACHABLE = np.iinfo(np.uint16).max
+
+class TourPlanner:
+    """
+    Plans the order in which the dirty cells are visited.
+
+    BFS distances between the start and every dirty cell are computed once and kept in
+    a uint16 matrix (distance[a][b] is the number of moves from node a to node b, node 0
+    is the start). The visiting order starts as a nearest-neighbour tour and is then
+    improved with 2-opt and Or-opt moves until nothing improves or time_limit seconds
+    have passed. Distances are not symmetric because of portals, so a reversed part of
+    the tour is priced in its new direction.
+    """
+
+    def __init__(self, compiled, start, dirty_cells, time_limit=1.0):
+        self.compiled = compiled
+        self.nodes = [start] + [cell for cell in dirty_cells if cell != start]
+        self.time_limit = time_limit
+        self._distance = None
+
+    @property
+    def distance(self):
+        if self._distance is None:
+            self._distance = self.distance_matrix()
+        return self._distance
+
+    def bfs_distances(self, source):
+        distance = [-1] * (self.compiled.rows * self.compiled.cols)
+        distance[source] = 0
+        queue = deque([source])
+        while queue:
+            cell = queue.popleft()
+            for table in self.compiled.next.values():
+                next_cell = table[cell]
+                if distance[next_cell] == -1:
+                    distance[next_cell] = distance[cell] + 1
+                    queue.append(next_cell)
+        return distance
+
+    def distance_matrix(self):
+        matrix = np.full((len(self.nodes), len(self.nodes)), UNREACHABLE, dtype=np.uint16)
+        for row, source in enumerate(self.nodes):
+            distance = self.bfs_distances(source)
+            matrix[row] = [distance[node] if 0 <= distance[node] < UNREACHABLE else UNREACHABLE for node in self.nodes]
+        return matrix
+
+    def nearest_neighbour_tour(self):
+        distance = self.distance
+        unvisited = np.ones(len(self.nodes), dtype=bool)
+        unvisited[0] = False
+        tour = [0]
+        # Dirty cells that cannot be reached from the start are left out
+        unvisited &= distance[0] != UNREACHABLE
+        while unvisited.any():
+            row = np.where(unvisited, distance[tour[-1]], UNREACHABLE)
+            node = int(np.argmin(row))
+            if row[node] == UNREACHABLE:
+                break
+            tour.append(node)
+            unvisited[node] = False
+        return tour
+
+    def tour_length(self, tour):
+        tour = np.asarray(tour)
+        return int(self.distance[tour[:-1], tour[1:]].astype(np.int64).sum())
+
+    def two_opt_pass(self, tour):
+        # Reversing tour[i..j] for every j at once. forward[k] and backward[k] are the
+        # costs of the first k legs walked forwards and backwards.
+        distance = self.distance.astype(np.int64)
+        tour = np.asarray(tour)
+        improved = False
+        for i in range(1, len(tour) - 1):
+            legs = distance[tour[:-1], tour[1:]]
+            reversed_legs = distance[tour[1:], tour[:-1]]
+            forward = np.concatenate(([0], np.cumsum(legs)))
+            backward = np.concatenate(([0], np.cumsum(reversed_legs)))
+            j = np.arange(i + 1, len(tour))
+            after = np.append(tour[j[:-1] + 1], -1)
+            old = legs[i - 1] + forward[j] - forward[i] + np.where(after >= 0, distance[tour[j], after], 0)
+            new = distance[tour[i - 1], tour[j]] + backward[j] - backward[i] + np.where(after >= 0, distance[tour[i], after], 0)
+            best = int(np.argmin(new - old))
+            if new[best] < old[best]:
+                tour[i:j[best] + 1] = tour[i:j[best] + 1][::-1].copy()
+                improved = True
+        return tour.tolist(), improved
+
+    def or_opt_pass(self, tour, max_segment=3):
+        # Moving tour[i..i+length-1] (kept in order) to after any other node
+        distance = self.distance.astype(np.int64)
+        improved = False
+        for length in range(1, max_segment + 1):
+            i = 1
+            while i + length <= len(tour):
+                first, last = tour[i], tour[i + length - 1]
+                before = tour[i - 1]
+                after = tour[i + length] if i + length < len(tour) else None
+                removed = distance[before, first] + (distance[last, after] - distance[before, after] if after is not None else 0)
+                rest = np.array(tour[:i] + tour[i + length:])
+                followers = np.append(rest[1:], -1)
+                inserted = distance[rest, first] + np.where(followers >= 0, distance[last, followers] - distance[rest, followers], 0)
+                inserted[i - 1] = removed  # Putting it back where it was is no change
+                k = int(np.argmin(inserted))
+                if inserted[k] < removed:
+                    segment = tour[i:i + length]
+                    rest = rest.tolist()
+                    tour = rest[:k + 1] + segment + rest[k + 1:]
+                    improved = True
+                i += 1
+        return tour, improved
+
+    def plan_tour(self):
+        deadline = time.time() + self.time_limit
+        tour = self.nearest_neighbour_tour()
+        improved = True
+        while improved and time.time() < deadline:
+            tour, improved_2opt = self.two_opt_pass(tour)
+            tour, improved_or = self.or_opt_pass(tour)
+            improved = improved_2opt or improved_or
+        return [self.nodes[node] for node in tour]
+
+    def shortest_path(self, source, target):
+        parent = {source: None}
+        queue = deque([source])
+        while queue:
+            cell = queue.popleft()
+            if cell == target:
+                break
+            for direction, table in self.compiled.next.items():
+                next_cell = table[cell]
+                if next_cell not in parent:
+                    parent[next_cell] = (cell, direction)
+                    queue.append(next_cell)
+        if target not in parent:
+            return None
+        path = []
+        while parent[target] is not None:
+            target, direction = parent[target]
+            path.append(direction)
+        path.reverse()
+        return path
+
+    def instructions(self):
+        # Cells the robot passes on the way are cleaned too, so they are skipped later
+        tour = self.plan_tour()
+        cleaned = {tour[0]}
+        current = tour[0]
+        instructions = []
+        for target in tour[1:]:
+            if target in cleaned:
+                continue
+            path = self.shortest_path(current, target)
+            if path is None:
+                continue  # Only possible through one-way portals; the target stays dirty
+            for direction in path:
+                current = self.compiled.next[direction][current]
+                cleaned.add(current)
+            instructions.extend(path)
+        return ''.join(instructions)
@@ -0,0 +1,106 @@
+import random
+import resource
+import sys
+import time
+import numpy as np
+import pandas as pd
+from landmarks import Landmarks
+from network import TrainNetwork
+from timetable import clean_schedule
+
+PERCENTILES = (50, 90, 99)
+
+def random_queries(network, count, seed=0):
+    rng = random.Random(seed)
+    stations = network.route_graph.stations
+    costs = ['stops', 'traveltime', 'price']
+    return [tuple(rng.sample(stations, 2)) + (rng.choice(costs),) for _ in range(count)]
+
+def compare_backends(network, queries, backends=('alt', 'csr', 'networkx')):
+    """
+    Runs the same queries on every backend and returns {backend: seconds per query}.
+    Raises AssertionError if two backends disagree on a cost.
+    """
+    timings, costs = {}, {}
+    for backend in backends:
+        start = time.perf_counter()
+        costs[backend] = [network.shortest_path(source, target, cost, backend)[1] for source, target, cost in queries]
+        timings[backend] = (time.perf_counter() - start) / len(queries)
+    for backend in backends[1:]:
+        assert costs[backend] == costs[backends[0]], f"{backend} and {backends[0]} found different costs"
+    return timings
+
+def build(path):
+    """
+    Builds the network of a schedule from the CSV without any cache. Returns the
+    network and {step: seconds} for parsing, the graphs and the landmarks.
+    """
+    timings = {}
+    start = time.perf_counter()
+    stops = clean_schedule(pd.read_csv(path))
+    timings['parse'] = time.perf_counter() - start
+    start = time.perf_counter()
+    network = TrainNetwork(stops)
+    timings['graphs'] = time.perf_counter() - start
+    start = time.perf_counter()
+    network.route_graph.landmarks = Landmarks.build(network.route_graph)
+    timings['landmarks'] = time.perf_counter() - start
+    return network, timings
+
+def query_latencies(network, count, seed=0):
+    """
+    Times count random queries per cost function with the backend main.py would use.
+    Returns {cost function: array of seconds}; arrivaltime queries start at random times.
+    """
+    rng = random.Random(seed)
+    stations = network.route_graph.stations
+    latencies = {}
+    for cost in ('stops', 'traveltime', 'price', 'arrivaltime'):
+        seconds = []
+        for _ in range(count):
+            source, target = rng.sample(stations, 2)
+            start = time.perf_counter()
+            if cost == 'arrivaltime':
+                clock = rng.randrange(24 * 60 * 60)
+                network.earliest_arrival(source, target, f"arrivaltime {clock // 3600:02}:{clock // 60 % 60:02}:00")
+            else:
+                network.shortest_path(source, target, cost)
+            seconds.append(time.perf_counter() - start)
+        latencies[cost] = np.array(seconds)
+    return latencies
+
+def report(path, count):
+    # Build time, memory and query latency percentiles of one schedule
+    network, timings = build(path)
+    print(f"{len(network.stops)} stop events, {len(network.route_graph.stations)} stations, "
+          f"{network.route_graph.node_count} nodes, {len(network.route_graph.targets)} edges")
+    for step, seconds in timings.items():
+        print(f"{step:>11}: {seconds:.2f} s")
+    array_bytes = sum(array.nbytes for array in network.arrays().values())
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # kB on Linux
+    print(f"{'arrays':>11}: {array_bytes / 2 ** 20:.1f} MB, peak RSS {peak:.1f} MB")
+    for cost, seconds in query_latencies(network, count).items():
+        percentiles = '  '.join(f"p{p} {np.percentile(seconds, p) * 1000:.3f} ms" for p in PERCENTILES)
+        print(f"{cost:>11}: {percentiles}  max {seconds.max() * 1000:.3f} ms")
+
+def main():
+    # backends compares the search backends on one schedule, costs reports build time, memory and latencies
+    if len(sys.argv) not in (2, 3, 4) or (len(sys.argv) == 4 and sys.argv[3] not in ('backends', 'costs')):
+        print("Usage: python benchmark.py <schedule.csv> [queries] [backends|costs]")
+        sys.exit(1)
+
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    if len(sys.argv) == 4 and sys.argv[3] == 'costs':
+        report(sys.argv[1], count)
+        return
+
+    network = TrainNetwork.from_csv(sys.argv[1])
+    queries = random_queries(network, count)
+    backends = ('alt', 'csr', 'networkx')
+    if network.route_graph.hierarchies is not None:
+        backends = ('ch',) + backends
+    for backend, seconds in compare_backends(network, queries, backends).items():
+        print(f"{backend:>10}: {seconds * 1000:.3f} ms per query")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+import sys
+import time
+from heapq import heapify, heappop, heappush
+import numpy as np
+from route_graph import COSTS
+
+INFINITY = float('inf')
+SETTLE_LIMIT = 60  # Nodes a witness search may settle before giving up
+EDGE_ARRAYS = ('tail', 'head', 'weight', 'first', 'second', 'original')
+
+def witness_distances(outgoing, source, skip, max_cost):
+    # Bounded Dijkstra from source that avoids skip; values are upper bounds on distances
+    distance = {source: 0}
+    heap = [(0, source)]
+    settled = 0
+    while heap and settled < SETTLE_LIMIT:
+        cost, node = heappop(heap)
+        if cost > distance[node]:
+            continue
+        settled += 1
+        for next_node, (weight, _) in outgoing[node].items():
+            next_cost = cost + weight
+            if next_cost <= max_cost and next_node != skip and next_cost < distance.get(next_node, INFINITY):
+                distance[next_node] = next_cost
+                heappush(heap, (next_cost, next_node))
+    return distance
+
+class ContractionHierarchy:
+    """
+    Contraction hierarchy of a RouteGraph for one static cost function.
+
+    Nodes are contracted one by one in the order given by rank (fewest added shortcuts
+    first). Contracting v adds a shortcut u -> w for every path u -> v -> w that has no
+    witness path of the same or lower cost around v. Every edge, original or shortcut,
+    is a row of the edge arrays: tail, head, weight and either the original route
+    graph edge (first = second = -1) or the two edges it replaces.
+
+    A query searches upwards (to higher ranks) from the source over the up edges and
+    from the target over the down edges; the shortest path passes through the highest
+    ranked node, where both searches meet.
+    """
+
+    def __init__(self, rank, edges, up_offsets, up_edges, down_offsets, down_edges):
+        self.rank = rank
+        self.edges = edges  # name in EDGE_ARRAYS -> array
+        self.up_offsets = up_offsets
+        self.up_edges = up_edges
+        self.down_offsets = down_offsets
+        self.down_edges = down_edges
+        self._lists = None
+
+    @classmethod
+    def build(cls, route_graph, cost):
+        node_count = route_graph.node_count
+        edges = {name: [] for name in EDGE_ARRAYS}
+        outgoing = [{} for _ in range(node_count)]  # node -> {head: (weight, edge)}
+        incoming = [{} for _ in range(node_count)]  # node -> {tail: (weight, edge)}
+
+        def add_edge(tail, head, weight, first, second, original):
+            # Parallel edges are not needed, only the cheapest one is kept
+            if head in outgoing[tail] and outgoing[tail][head][0] <= weight:
+                return
+            edge = len(edges['tail'])
+            for name, value in zip(EDGE_ARRAYS, (tail, head, weight, first, second, original)):
+                edges[name].append(value)
+            outgoing[tail][head] = incoming[head][tail] = (weight, edge)
+
+        weights = route_graph.weights[cost]
+        for edge in np.flatnonzero(np.isfinite(weights)).tolist():
+            add_edge(int(route_graph.source[edge]), int(route_graph.targets[edge]), float(weights[edge]), -1, -1, edge)
+
+        def shortcuts(node, search=True):
+            # Without search only direct edges count as witnesses, a cheap estimate for the priority
+            found = []
+            for tail, (in_weight, in_edge) in incoming[node].items():
+                heads = [(head, in_weight + weight, edge) for head, (weight, edge) in outgoing[node].items() if head != tail]
+                if not heads:
+                    continue
+                if search:
+                    distance = witness_distances(outgoing, tail, node, max(via for _, via, _ in heads))
+                else:
+                    distance = {head: weight for head, (weight, _) in outgoing[tail].items()}
+                found.extend((tail, head, via, in_edge, edge) for head, via, edge in heads
+                             if distance.get(head, INFINITY) > via)
+            return found
+
+        deleted_neighbours = [0] * node_count
+        depth = [0] * node_count  # Longest chain of contracted nodes below a node, keeps the hierarchy flat
+        def priority(node):
+            return (len(shortcuts(node, False)) - len(incoming[node]) - len(outgoing[node])
+                    + deleted_neighbours[node] + depth[node])
+
+        heap = [(priority(node), node) for node in range(node_count)]
+        heapify(heap)
+        rank = np.zeros(node_count, dtype=np.int64)
+        up, down = [], []  # (node, edge) pairs: edges leaving node upwards / reaching node from above
+        level = 0
+        while heap:
+            _, node = heappop(heap)
+            current = priority(node)
+            if heap and current > heap[0][0]:
+                heappush(heap, (current, node))  # Lazy update, contract later
+                continue
+            for tail, head, weight, first, second in shortcuts(node):
+                add_edge(tail, head, weight, first, second, -1)
+            rank[node] = level
+            level += 1
+            up.extend((node, edge) for _, edge in outgoing[node].values())
+            down.extend((node, edge) for _, edge in incoming[node].values())
+            for head in outgoing[node]:
+                del incoming[head][node]
+                deleted_neighbours[head] += 1
+                depth[head] = max(depth[head], depth[node] + 1)
+            for tail in incoming[node]:
+                del outgoing[tail][node]
+                deleted_neighbours[tail] += 1
+                depth[tail] = max(depth[tail], depth[node] + 1)
+            outgoing[node], incoming[node] = {}, {}
+
+        edges = {name: np.array(values, dtype=np.float64 if name == 'weight' else np.int64)
+                 for name, values in edges.items()}
+        return cls(rank, edges, *cls.csr(up, node_count), *cls.csr(down, node_count))
+
+    @staticmethod
+    def csr(pairs, node_count):
+        # (node, edge) pairs -> offsets and edge ids grouped by node
+        pairs = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+        order = np.argsort(pairs[:, 0], kind='stable')
+        offsets = np.zeros(node_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(pairs[:, 0], minlength=node_count), out=offsets[1:])
+        return offsets, pairs[order, 1]
+
+    def arrays(self):
+        return dict(rank=self.rank, up_offsets=self.up_offsets, up_edges=self.up_edges,
+                    down_offsets=self.down_offsets, down_edges=self.down_edges, **self.edges)
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        return cls(arrays['rank'], {name: arrays[name] for name in EDGE_ARRAYS}, arrays['up_offsets'],
+                   arrays['up_edges'], arrays['down_offsets'], arrays['down_edges'])
+
+    def query(self, source, target):
+        """
+        Returns (route graph edge ids, cost) of a shortest path between two nodes, or
+        (None, None) if there is none.
+        """
+        if self._lists is None:
+            self._lists = tuple(array.tolist() for array in (
+                self.up_offsets, self.up_edges, self.down_offsets, self.down_edges,
+                self.edges['tail'], self.edges['head'], self.edges['weight']))
+        up_offsets, up_edges, down_offsets, down_edges, tails, heads, weights = self._lists
+
+        # Index 0 searches forwards from source over up edges, index 1 backwards from target over down edges
+        distance = ({source: 0}, {target: 0})
+        parent = ({}, {})
+        heaps = ([(0, source)], [(0, target)])
+        searches = ((up_offsets, up_edges, heads), (down_offsets, down_edges, tails))
+        best, meeting = (0, source) if source == target else (INFINITY, None)
+        while True:
+            # Advance the search with the smaller key; stop once neither can improve best
+            keys = [heap[0][0] if heap else INFINITY for heap in heaps]
+            side = 0 if keys[0] <= keys[1] else 1
+            if keys[side] >= best:
+                break
+            cost, node = heappop(heaps[side])
+            if cost > distance[side][node]:
+                continue
+            other = distance[1 - side].get(node)
+            if other is not None and cost + other < best:
+                best, meeting = cost + other, node
+            offsets, edge_ids, ends = searches[side]
+            for index in range(offsets[node], offsets[node + 1]):
+                edge = edge_ids[index]
+                next_node, next_cost = ends[edge], cost + weights[edge]
+                if next_cost < distance[side].get(next_node, INFINITY):
+                    distance[side][next_node] = next_cost
+                    parent[side][next_node] = edge
+                    heappush(heaps[side], (next_cost, next_node))
+        if meeting is None:
+            return None, None
+
+        path = []
+        node = meeting
+        while node in parent[0]:
+            path.append(parent[0][node])
+            node = tails[parent[0][node]]
+        path.reverse()
+        node = meeting
+        while node in parent[1]:
+            path.append(parent[1][node])
+            node = heads[parent[1][node]]
+        # distance may have improved since best was recorded, the parents match distance
+        return self.unpack(path), distance[0][meeting] + distance[1][meeting]
+
+    def unpack(self, path):
+        """
+        Replaces every shortcut by the two edges it stands for, down to route graph edges.
+        Ties can hide a zero cost cycle in a shortcut (boarding a train and leaving it
+        at the same stop), such cycles are cut out of the path.
+        """
+        first, second, original = self.edges['first'], self.edges['second'], self.edges['original']
+        tails, heads = self.edges['tail'], self.edges['head']
+        edges = []
+        position = {}  # node -> number of edges on the path before it
+        stack = path[::-1]
+        while stack:
+            edge = stack.pop()
+            if first[edge] >= 0:
+                stack.extend((int(second[edge]), int(first[edge])))
+                continue
+            if not edges:
+                position[int(tails[edge])] = 0
+            head = int(heads[edge])
+            if head in position:
+                for removed in edges[position[head]:]:
+                    del position[int(heads[removed])]
+                del edges[position[head]:]
+            else:
+                edges.append(edge)
+                position[head] = len(edges)
+        return [int(original[edge]) for edge in edges]
+
+def save_hierarchies(hierarchies, key, path):
+    arrays = {'key': np.array(key)}
+    for cost, hierarchy in hierarchies.items():
+        arrays.update({f'{cost}_{name}': array for name, array in hierarchy.arrays().items()})
+    np.savez(path, **arrays)
+
+def load_hierarchies(route_graph, path):
+    # Returns {cost: ContractionHierarchy} stored at path, or None if missing or built for another graph
+    try:
+        data = np.load(path)
+    except FileNotFoundError:
+        return None
+    with data:
+        if str(data['key']) != route_graph.fingerprint():
+            return None
+        return {cost: ContractionHierarchy.from_arrays({name[len(cost) + 1:]: data[name] for name in data.files
+                                                        if name.startswith(cost + '_')})
+                for cost in COSTS}
+
+def main():
+    # Offline step: contracts the route graph of a schedule for every static cost function
+    if len(sys.argv) != 2:
+        print("Usage: python contraction.py <schedule.csv>")
+        sys.exit(1)
+
+    from network import TrainNetwork  # Imported here because network imports this module
+    from schedule_cache import cache_path
+    network = TrainNetwork.from_csv(sys.argv[1])
+    hierarchies = {}
+    for cost in COSTS:
+        start = time.perf_counter()
+        hierarchies[cost] = ContractionHierarchy.build(network.route_graph, cost)
+        shortcuts = int(np.count_nonzero(hierarchies[cost].edges['first'] >= 0))
+        print(f"{cost:>10}: {shortcuts} shortcuts in {time.perf_counter() - start:.1f} s")
+    save_hierarchies(hierarchies, network.route_graph.fingerprint(), cache_path(sys.argv[1], '.ch.npz'))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+from bisect import bisect_left, bisect_right
+import numpy as np
+from timetable import SECONDS_PER_DAY, trip_times
+
+CHANGE_TIME = 15 * 60  # Minimum time for changing from one train to another
+SCAN_ARRAYS = ('departure_of_day', 'start_day', 'duration', 'from_station', 'to_station', 'trip', 'from_islno', 'to_islno')
+
+def format_arrival(seconds):
+    # Day 0 is written as HH:MM:SS, later days as DD:HH:MM:SS
+    days, rest = divmod(int(seconds), SECONDS_PER_DAY)
+    hours, rest = divmod(rest, 3600)
+    clock = f"{hours:02}:{rest // 60:02}:{rest % 60:02}"
+    return clock if days == 0 else f"{days:02}:{clock}"
+
+def parse_clock(text):
+    hours, minutes, seconds = (int(part) for part in text.strip().split(':'))
+    return hours * 3600 + minutes * 60 + seconds
+
+class ConnectionScan:
+    """
+    Earliest-arrival router (Connection Scan Algorithm) over a daily timetable.
+
+    An elementary connection is one train going from one stop to the next. All of them
+    are kept in arrays sorted by the time of day of their departure; every train runs
+    every day, so day D is scanned by adding D days to those times. A connection can be
+    used if its train instance was already boarded, or if the traveller is at its
+    departure station at least CHANGE_TIME before it leaves (no change time is needed at
+    the station the journey starts from).
+    """
+
+    def __init__(self, stops, max_days=30):
+        arrival, departure = trip_times(stops)
+        train = stops['train'].to_numpy()
+        same_train = train[1:] == train[:-1]
+        first = np.flatnonzero(same_train)  # Stop a connection leaves from
+        second = first + 1
+
+        self.stations = sorted(set(stops['station']))
+        self.station_index = {station: k for k, station in enumerate(self.stations)}
+        station = np.array([self.station_index[name] for name in stops['station']], dtype=np.int64)
+        trains, trip = np.unique(train, return_inverse=True)
+        self.trip_train = trains.tolist()  # Train of each trip; update_train adds a trip per section of a cancelled train
+
+        order = np.argsort(departure[first] % SECONDS_PER_DAY, kind='stable')
+        first, second = first[order], second[order]
+        islno = stops['islno'].to_numpy()
+        self._arrays = {
+            'departure_of_day': departure[first] % SECONDS_PER_DAY,
+            'start_day': departure[first] // SECONDS_PER_DAY,  # Days since the train left its first stop
+            'duration': arrival[second] - departure[first],
+            'from_station': station[first],
+            'to_station': station[second],
+            'trip': trip[first],
+            'from_islno': islno[first],
+            'to_islno': islno[second],
+        }
+        self._connections = None
+        self.max_days = max_days
+
+    def connections(self):
+        # The scan loop runs in Python, where lists are faster to index than NumPy arrays;
+        # they are converted on first use, so workers that never scan keep the shared arrays
+        if self._connections is None:
+            self._connections = {name: self._arrays[name].tolist() for name in SCAN_ARRAYS}
+            self._arrays = None  # update_train only patches the lists
+        return self._connections
+
+    def arrays(self):
+        # Everything needed to rebuild the router with from_arrays, as NumPy arrays without objects
+        connections = self._arrays if self._connections is None else self._connections
+        arrays = {name: np.asarray(connections[name], dtype=np.int64) for name in SCAN_ARRAYS}
+        arrays.update(stations=np.array(self.stations, dtype=str), trip_train=np.array(self.trip_train, dtype=str),
+                      max_days=np.array(self.max_days))
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        scan = cls.__new__(cls)
+        scan.stations = arrays['stations'].tolist()
+        scan.trip_train = arrays['trip_train'].tolist()
+        scan.station_index = {station: k for k, station in enumerate(scan.stations)}
+        scan._arrays = {name: arrays[name] for name in SCAN_ARRAYS}
+        scan._connections = None
+        scan.max_days = int(arrays['max_days'])
+        return scan
+
+    def update_train(self, train, stops, cancelled):
+        """
+        Replaces the connections of one train by those of stops (all its rows of the
+        cleaned schedule, after a change), leaving out every connection that departs
+        from or arrives at a cancelled stop. Every section after a cancelled stop runs
+        as a trip of its own, as in Raptor, so a passenger cannot stay on board through
+        the cancelled stop.
+        """
+        connections = self.connections()
+        trips = [t for t, other in enumerate(self.trip_train) if other == train]  # Sections of earlier updates
+        sections = set(trips)
+        old = [c for c, other in enumerate(connections['trip']) if other in sections]
+        for name in SCAN_ARRAYS:
+            values = connections[name]
+            for c in reversed(old):
+                del values[c]
+
+        arrival, departure = trip_times(stops)
+        station = [self.station_index[name] for name in stops['station']]
+        islno = stops['islno'].tolist()
+        section, running = 0, False
+        for k in range(len(stops) - 1):
+            if cancelled[k] or cancelled[k + 1]:
+                if running:
+                    section, running = section + 1, False  # The next connection starts a new section
+                continue
+            if section == len(trips):
+                trips.append(len(self.trip_train))
+                self.trip_train.append(train)
+            running = True
+            departs = int(departure[k])
+            values = (departs % SECONDS_PER_DAY, departs // SECONDS_PER_DAY, int(arrival[k + 1]) - departs,
+                      station[k], station[k + 1], trips[section], islno[k], islno[k + 1])
+            position = bisect_right(connections['departure_of_day'], values[0])
+            for name, value in zip(SCAN_ARRAYS, values):
+                connections[name].insert(position, value)
+
+    def earliest_arrival(self, source, target, start_time):
+        """
+        Returns (legs, arrival) for the earliest arrival at target when starting from
+        source at start_time (seconds after midnight of day 0), or (None, None) if
+        target cannot be reached. legs is a list of (train, from islno, to islno).
+        """
+        return self.earliest_arrivals(source, [target], start_time)[target]
+
+    def earliest_arrivals(self, source, targets, start_time):
+        # One scan from source answers every target: {target: (legs, arrival)}
+        source = self.station_index[source]
+        goals = {self.station_index[target] for target in targets}
+        ready = [float('inf')] * len(self.stations)  # Earliest time to board a new train
+        ready[source] = start_time
+        arrival_at = {}  # Earliest arrival at each goal
+        last_goal = float('inf')  # The scan can stop once every goal is reached before this
+        boarded = {}  # (trip, day the train left its first stop) -> connection and day it was boarded
+        reached_by = {}  # station -> (boarded connection, its day, last connection, its day)
+
+        connections = self.connections()
+        departure_of_day, start_day, duration, from_station, to_station, trip = (
+            connections[name] for name in SCAN_ARRAYS[:6])
+        day = 0
+        first = bisect_left(departure_of_day, start_time)
+        while day < self.max_days and day * SECONDS_PER_DAY < last_goal:
+            offset = day * SECONDS_PER_DAY
+            for c in range(first, len(departure_of_day)):
+                departs = offset + departure_of_day[c]
+                if departs >= last_goal:
+                    break
+                instance = (trip[c], day - start_day[c])
+                entry = boarded.get(instance)
+                if entry is None:
+                    if ready[from_station[c]] > departs:
+                        continue
+                    entry = boarded[instance] = (c, day)
+                arrives = departs + duration[c]
+                station = to_station[c]
+                if arrives + CHANGE_TIME < ready[station]:
+                    ready[station] = arrives + CHANGE_TIME
+                    reached_by[station] = entry + (c, day)
+                    if station in goals:
+                        arrival_at[station] = arrives
+                        if len(arrival_at) == len(goals):
+                            last_goal = max(arrival_at.values())
+            day += 1
+            first = 0
+
+        results = {}
+        for target in targets:
+            station = self.station_index[target]
+            if station not in arrival_at:
+                results[target] = (None, None)
+                continue
+            legs = []
+            while station != source:
+                entry, _, exit, _ = reached_by[station]
+                legs.append((self.trip_train[trip[entry]], connections['from_islno'][entry], connections['to_islno'][exit]))
+                station = from_station[entry]
+            legs.reverse()
+            results[target] = (legs, arrival_at[self.station_index[target]])
+        return results
@@ -0,0 +1,57 @@
+from heapq import heappop, heappush
+
+INFINITY = float('inf')
+
+def dijkstra(offsets, targets, weights, source, goals=None, potential=None):
+    """
+    Dijkstra over a graph in CSR form (offsets, targets and weights as Python lists;
+    edges with an infinite weight are skipped).
+
+    Stops as soon as every node in goals is settled, or settles every reachable node
+    if goals is None. Returns (distance, parent_edge): dicts from node to its distance
+    and to the id of the edge it was reached by, so paths and costs come out of a
+    single search.
+
+    With a potential (a lower bound on the remaining cost per node, infinite for nodes
+    that cannot reach a goal) the search becomes A*. The potential must be consistent,
+    as the landmark bounds are, so settled nodes still have their exact distance.
+    """
+    distance = {source: 0}
+    parent_edge = {}
+    heap = [(0, 0, source)]
+    remaining = set(goals) if goals is not None else None
+    while heap:
+        _, cost, node = heappop(heap)
+        if cost > distance[node]:
+            continue  # Outdated heap entry
+        if remaining is not None:
+            remaining.discard(node)
+            if not remaining:
+                break
+        for edge in range(offsets[node], offsets[node + 1]):
+            weight = weights[edge]
+            if weight == INFINITY:
+                continue
+            next_cost = cost + weight
+            next_node = targets[edge]
+            if next_cost < distance.get(next_node, INFINITY):
+                if potential is None:
+                    key = next_cost
+                else:
+                    key = next_cost + potential[next_node]
+                    if key == INFINITY:
+                        continue
+                distance[next_node] = next_cost
+                parent_edge[next_node] = edge
+                heappush(heap, (key, next_cost, next_node))
+    return distance, parent_edge
+
+def path_edges(parent_edge, sources, target):
+    # Edge ids from the search source to target, following the parent edges backwards
+    edges = []
+    while target in parent_edge:
+        edge = parent_edge[target]
+        edges.append(edge)
+        target = sources[edge]
+    edges.reverse()
+    return edges
@@ -0,0 +1,97 @@
+import math
+import random
+import string
+import sys
+
+HEADER = ('Train No.,train Name,islno,station Code,Station Name,Arrival time,Departure time,Distance,'
+          'Source Station Code,source Station Name,Destination station Code,Destination Station Name')
+SPACING = 15  # km between neighbouring stations of the grid
+MIN_STOPS, MAX_STOPS = 5, 60
+MAX_TRIPS = 6  # Trains running the same line at different times
+
+def station_code(k):
+    # 0 -> 'AAAA', 1 -> 'AAAB', ...; four letters like the codes in the real schedule
+    letters = []
+    for _ in range(4):
+        k, letter = divmod(k, 26)
+        letters.append(string.ascii_uppercase[letter])
+    return ''.join(reversed(letters))
+
+def clock(seconds):
+    seconds %= 24 * 60 * 60
+    return f"'{seconds // 3600:02}:{seconds // 60 % 60:02}:{seconds % 60:02}'"
+
+def random_line(rng, neighbours, length):
+    # A walk over the grid that does not visit a station twice
+    line = [rng.randrange(len(neighbours))]
+    seen = {line[0]}
+    while len(line) < length:
+        choices = [station for station in neighbours[line[-1]] if station not in seen]
+        if not choices:
+            break
+        line.append(rng.choice(choices))
+        seen.add(line[-1])
+    return line
+
+def generate(path, stations=10000, stop_events=1000000, seed=0):
+    """
+    Writes a random schedule in the format of the real schedule files: about
+    stop_events rows over at most the given number of stations. Stations sit on a
+    square grid with some jitter, every line is a walk between neighbouring stations
+    and is run by one to MAX_TRIPS trains at random times of day with their own
+    speed. Returns the number of rows written.
+    """
+    rng = random.Random(seed)
+    side = math.ceil(math.sqrt(stations))
+    position = [((k % side + rng.uniform(-0.3, 0.3)) * SPACING, (k // side + rng.uniform(-0.3, 0.3)) * SPACING)
+                for k in range(stations)]
+    neighbours = [[other for other in (k - side, k + side, k - 1 if k % side else -1, k + 1 if (k + 1) % side else -1)
+                   if 0 <= other < stations] for k in range(stations)]
+    codes = [f'{station_code(k):<4}' for k in range(stations)]
+    names = [f'{"STATION " + str(k):<15}' for k in range(stations)]
+
+    rows = 0
+    train_no = 10000
+    with open(path, 'w') as file:
+        file.write(HEADER + '\n')
+        while rows < stop_events:
+            line = random_line(rng, neighbours, rng.randint(MIN_STOPS, MAX_STOPS))
+            if len(line) < 2:
+                continue
+            distance = [0]
+            for a, b in zip(line, line[1:]):
+                distance.append(distance[-1] + max(1, round(math.dist(position[a], position[b]))))
+            ends = f'{codes[line[0]]},{names[line[0]]},{codes[line[-1]]},{names[line[-1]]}'
+
+            for _ in range(rng.randint(1, MAX_TRIPS)):
+                train_no += 1
+                speed = rng.uniform(40, 110)  # km/h
+                name = f'{"SYN " + codes[line[0]].strip() + " " + codes[line[-1]].strip() + " EXP":<15}'[:15]
+                time = rng.randrange(0, 24 * 60 * 60, 60)
+                lines = []
+                for islno, station in enumerate(line, start=1):
+                    if islno > 1:
+                        time += 60 * max(1, round((distance[islno - 1] - distance[islno - 2]) / speed * 60))
+                    arrival = clock(time) if islno > 1 else "'00:00:00'"
+                    if islno < len(line):
+                        time += 60 * rng.randint(1, 5)  # Dwell time
+                    departure = clock(time) if islno < len(line) else "'00:00:00'"
+                    lines.append(f"'{train_no}',{name},{islno},{codes[station]},{names[station]},"
+                                 f"{arrival},{departure},{distance[islno - 1]},{ends}\n")
+                file.writelines(lines)
+                rows += len(lines)
+    return rows
+
+def main():
+    if not 2 <= len(sys.argv) <= 5:
+        print("Usage: python generator.py <schedule.csv> [stations] [stop_events] [seed]")
+        sys.exit(1)
+
+    stations = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    stop_events = int(sys.argv[3]) if len(sys.argv) > 3 else 1000000
+    seed = int(sys.argv[4]) if len(sys.argv) > 4 else 0
+    rows = generate(sys.argv[1], stations, stop_events, seed)
+    print(f"{rows} stop events written to {sys.argv[1]}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+import os
+import numpy as np
+from dijkstra import dijkstra
+from route_graph import COSTS
+
+LANDMARKS = 8
+
+def distances(offsets, targets, weights, source, node_count):
+    # Distances from source to every node as a float32 array, inf if unreachable
+    distance, _ = dijkstra(offsets, targets, weights, source)
+    result = np.full(node_count, np.inf, dtype=np.float32)
+    result[list(distance)] = list(distance.values())
+    return result
+
+class Landmarks:
+    """
+    ALT lower bounds (A*, landmarks and the triangle inequality) for a RouteGraph.
+
+    For a landmark L, d(v, t) >= d(L, t) - d(L, v) and d(v, t) >= d(v, L) - d(t, L).
+    forward[cost][i] holds d(L_i, v) and backward[cost][i] holds d(v, L_i) for every
+    node v of the route graph, as float32 arrays of shape (landmarks, nodes) with inf
+    for unreachable nodes. Landmarks are stations, picked per cost function by
+    farthest-point selection.
+    """
+
+    def __init__(self, stations, forward, backward, key, count):
+        self.stations = stations
+        self.forward = forward
+        self.backward = backward
+        self.key = key
+        self.count = count  # Landmarks asked for; fewer are kept if the graph runs out of stations
+
+    @classmethod
+    def build(cls, route_graph, count=LANDMARKS):
+        station_count, node_count = len(route_graph.stations), route_graph.node_count
+        order = np.argsort(route_graph.targets, kind='stable')
+        reverse_offsets = np.zeros(node_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(route_graph.targets, minlength=node_count), out=reverse_offsets[1:])
+        reverse_offsets, reverse_targets = reverse_offsets.tolist(), route_graph.source[order].tolist()
+
+        stations, forward, backward = {}, {}, {}
+        for cost in COSTS:
+            offsets, targets, _, weights = route_graph.adjacency(cost)
+            reverse_weights = route_graph.weights[cost][order].tolist()
+
+            # The first landmark is the station farthest from the best connected one
+            start = int(np.argmax(np.diff(route_graph.offsets[:station_count + 1])))
+            closest = distances(offsets, targets, weights, start, node_count)[:station_count]
+            chosen, forward_rows, backward_rows = [], [], []
+            while len(chosen) < count:
+                score = np.where(np.isfinite(closest), closest, -1)
+                score[[start] + chosen] = -1
+                if score.max() <= 0:
+                    break
+                landmark = int(np.argmax(score))
+                chosen.append(landmark)
+                forward_rows.append(distances(offsets, targets, weights, landmark, node_count))
+                backward_rows.append(distances(reverse_offsets, reverse_targets, reverse_weights, landmark, node_count))
+                closest = np.minimum(closest, forward_rows[-1][:station_count])
+
+            stations[cost] = np.array(chosen, dtype=np.int64)
+            forward[cost] = np.array(forward_rows, dtype=np.float32).reshape(len(chosen), node_count)
+            backward[cost] = np.array(backward_rows, dtype=np.float32).reshape(len(chosen), node_count)
+        return cls(stations, forward, backward, route_graph.fingerprint(), count)
+
+    @classmethod
+    def load_or_build(cls, route_graph, path, count=LANDMARKS):
+        # Reuses the landmarks stored at path if they were computed on this graph
+        key = route_graph.fingerprint()
+        if os.path.exists(path):
+            with np.load(path) as data:
+                if str(data['key']) == key and int(data['count']) == count:
+                    return cls.from_arrays(data)
+        landmarks = cls.build(route_graph, count)
+        landmarks.save(path)
+        return landmarks
+
+    def arrays(self):
+        arrays = {'key': np.array(self.key), 'count': np.array(self.count)}
+        for cost in self.forward:
+            arrays.update({f'{cost}_stations': self.stations[cost],
+                           f'{cost}_forward': self.forward[cost],
+                           f'{cost}_backward': self.backward[cost]})
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        costs = [cost for cost in COSTS if f'{cost}_forward' in arrays]
+        return cls({cost: arrays[f'{cost}_stations'] for cost in costs},
+                   {cost: arrays[f'{cost}_forward'] for cost in costs},
+                   {cost: arrays[f'{cost}_backward'] for cost in costs}, str(arrays['key']), int(arrays['count']))
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        np.savez(path, **self.arrays())
+
+    def forget(self, cost):
+        # The distances of cost are out of date, its queries run without a potential
+        for distances in (self.stations, self.forward, self.backward):
+            distances.pop(cost, None)
+
+    def potential(self, cost, goals):
+        """
+        Lower bound on the cost from every node to the nearest of goals, as a list for
+        the search loop, or None if there are no landmarks for cost. The maximum of the
+        landmark bounds is consistent, and so is the minimum over several goals.
+        """
+        if cost not in self.forward:
+            return None
+        forward, backward = self.forward[cost], self.backward[cost]
+        bound = None
+        with np.errstate(invalid='ignore'):
+            for goal in goals:
+                # inf - inf gives nan (no information), which fmax ignores
+                towards = np.fmax.reduce(forward[:, [goal]] - forward, axis=0, initial=0)
+                away = np.fmax.reduce(backward - backward[:, [goal]], axis=0, initial=0)
+                goal_bound = np.fmax(towards, away)
+                bound = goal_bound if bound is None else np.minimum(bound, goal_bound)
+        return bound.tolist()
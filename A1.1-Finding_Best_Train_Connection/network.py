@@ -0,0 +1,157 @@
+import numpy as np
+from contraction import ContractionHierarchy, load_hierarchies
+from csa import ConnectionScan, parse_clock
+from landmarks import Landmarks
+from raptor import Raptor
+from route_graph import COSTS, RouteGraph
+from schedule_cache import cache_path, load_stops, stops_frame
+from timetable import SECONDS_PER_DAY, clean_schedule
+
+class TrainNetwork:
+    """
+    The train network of one schedule, built once and shared by every cost function.
+
+    stops, traveltime and price queries run on a RouteGraph that keeps every train
+    segment and carries one weight array per cost function, so the cost function is
+    picked per query. arrivaltime queries depend on departure times and changes, and
+    are answered by a ConnectionScan over the same schedule. pareto_journeys trades
+    arrival time, transfers and price off against each other in one Raptor query.
+    """
+
+    def __init__(self, stops):
+        # stops is a schedule cleaned by clean_schedule
+        self.stops = stops
+        self.cancelled = np.zeros(len(stops), dtype=bool)  # Stops cancelled by cancel()
+        self.route_graph = RouteGraph(stops)
+        self.connection_scan = ConnectionScan(stops)
+        self._raptor = None
+
+    @property
+    def raptor(self):
+        # Multi-criteria router, built on first use
+        if self._raptor is None:
+            self._raptor = Raptor(self.stops, self.cancelled)
+        return self._raptor
+
+    @classmethod
+    def from_dataframe(cls, schedule_df):
+        return cls(clean_schedule(schedule_df))
+
+    @classmethod
+    def from_csv(cls, path):
+        # The parsed schedule and the landmark distances are cached in .cache/ next to the schedule,
+        # a contraction hierarchy is used if contraction.py has been run for it
+        network = cls(load_stops(path))
+        network.route_graph.landmarks = Landmarks.load_or_build(network.route_graph, cache_path(path, '.landmarks.npz'))
+        network.route_graph.hierarchies = load_hierarchies(network.route_graph, cache_path(path, '.ch.npz'))
+        return network
+
+    def shortest_path(self, source, target, cost_function, backend=None):
+        # Returns (legs, cost), legs being (train, from islno, to islno), or (None, None)
+        return self.route_graph.shortest_path(source, target, cost_function, backend)
+
+    def earliest_arrival(self, source, target, cost_function):
+        # cost_function is 'arrivaltime HH:MM:SS'
+        start_time = parse_clock(cost_function.split()[1])
+        return self.connection_scan.earliest_arrival(source, target, start_time)
+
+    def arrays(self):
+        """
+        The network as a flat dict of NumPy arrays ('component/name' -> array) without
+        Python objects, so it can be placed in shared memory and rebuilt by from_arrays.
+        """
+        stops = {name: self.stops[name].to_numpy() for name in ('islno', 'arrival', 'departure')}
+        for name in ('train', 'station'):
+            # Codes and names, as in the schedule cache; a no-op for the categoricals of a cached schedule
+            column = self.stops[name].astype('category')
+            stops[name + '_id'] = column.cat.codes.to_numpy()
+            stops[name + 's'] = column.cat.categories.to_numpy(dtype=str)
+        parts = {'stops': stops,
+                 'network': {'cancelled': self.cancelled},
+                 'route_graph': self.route_graph.arrays(),
+                 'connection_scan': self.connection_scan.arrays()}
+        if self.route_graph.landmarks is not None:
+            parts['landmarks'] = self.route_graph.landmarks.arrays()
+        for cost, hierarchy in (self.route_graph.hierarchies or {}).items():
+            parts[f'hierarchy_{cost}'] = hierarchy.arrays()
+        return {f'{part}/{name}': array for part, arrays in parts.items() for name, array in arrays.items()}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        parts = {}
+        for key, array in arrays.items():
+            part, name = key.split('/')
+            parts.setdefault(part, {})[name] = array
+        network = cls.__new__(cls)
+        network.stops = stops_frame(parts['stops'])  # Views of the arrays
+        network.cancelled = parts['network']['cancelled']
+        network.route_graph = RouteGraph.from_arrays(parts['route_graph'])
+        network.connection_scan = ConnectionScan.from_arrays(parts['connection_scan'])
+        network._raptor = None
+        if 'landmarks' in parts:
+            network.route_graph.landmarks = Landmarks.from_arrays(parts['landmarks'])
+        hierarchies = {part[len('hierarchy_'):]: ContractionHierarchy.from_arrays(arrays)
+                       for part, arrays in parts.items() if part.startswith('hierarchy_')}
+        network.route_graph.hierarchies = hierarchies or None
+        return network
+
+    def train_rows(self, train, from_islno, to_islno):
+        # Rows of train in stops, and those of them with islno from_islno..to_islno
+        rows = np.flatnonzero((self.stops['train'] == train).to_numpy())
+        islno = self.stops['islno'].to_numpy()[rows]
+        selected = rows[(islno >= from_islno) & (islno <= to_islno)]
+        if not len(selected):
+            raise ValueError(f"Train {train} has no stops with islno {from_islno} to {to_islno}")
+        return rows, selected
+
+    def delay(self, train, from_islno, to_islno, seconds):
+        """
+        Delays arrival and departure of the stops of train with islno from_islno to
+        to_islno by seconds (negative to make up time). Only the traveltime weights of
+        the train's segments and its connections are patched; preprocessing that
+        depends on them is dropped, everything else is kept.
+        """
+        rows, delayed = self.train_rows(train, from_islno, to_islno)
+        for column in ('arrival', 'departure'):
+            # A copy, the columns of a cached schedule are read-only memory maps
+            times = self.stops[column].to_numpy(copy=True)
+            times[delayed] = (times[delayed] + seconds) % SECONDS_PER_DAY
+            self.stops[column] = times
+
+        arrival, departure = self.stops['arrival'].to_numpy()[rows], self.stops['departure'].to_numpy()[rows]
+        changed, decreased = [], []
+        for k in range(len(rows) - 1):
+            edge = self.route_graph.ride_edge(int(rows[k]))
+            time = float((arrival[k + 1] - departure[k]) % SECONDS_PER_DAY)
+            old = self.route_graph.weights['traveltime'][edge]
+            if old != np.inf and time != old:
+                self.route_graph.set_weight(edge, 'traveltime', time)
+                changed.append('traveltime')
+                if time < old:
+                    decreased.append('traveltime')
+        self.connection_scan.update_train(train, self.stops.iloc[rows], self.cancelled[rows])
+        self.route_graph.invalidate(set(changed), set(decreased))
+        self._raptor = None
+
+    def cancel(self, train, from_islno, to_islno):
+        # The train no longer serves its stops with islno from_islno to to_islno
+        rows, cancelled = self.train_rows(train, from_islno, to_islno)
+        self.cancelled[cancelled] = True
+        for row in cancelled.tolist():
+            self.route_graph.cancel_stop(row)
+        self.connection_scan.update_train(train, self.stops.iloc[rows], self.cancelled[rows])
+        self.route_graph.invalidate(COSTS)
+        self._raptor = None
+
+    def pareto_journeys(self, source, target, start_time):
+        # (arrival, transfers, price, legs) for every Pareto-optimal journey, start_time is 'HH:MM:SS'
+        return self.raptor.journeys(source, target, parse_clock(start_time))
+
+    def shortest_paths(self, source, targets, cost_function):
+        # One search for every target of source: {target: (legs, cost)}
+        return self.route_graph.shortest_paths(source, targets, cost_function)
+
+    def earliest_arrivals(self, source, targets, cost_function):
+        # One scan for every target of source: {target: (legs, arrival)}
+        start_time = parse_clock(cost_function.split()[1])
+        return self.connection_scan.earliest_arrivals(source, targets, start_time)
@@ -0,0 +1,76 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from main import process_problems
+from network import TrainNetwork
+
+CHUNKS_PER_WORKER = 4
+
+def share(arrays):
+    """
+    Copies {name: array} into shared memory blocks. Returns the blocks (to close and
+    unlink once the workers are done) and a picklable spec for attach().
+    """
+    blocks, spec = [], []
+    for name, array in arrays.items():
+        array = np.asarray(array, order='C')  # ascontiguousarray would turn scalars into 1-d arrays
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+        blocks.append(block)
+        spec.append((name, block.name, array.shape, array.dtype.str))
+    return blocks, spec
+
+def attach(spec):
+    # Zero-copy views of the arrays described by spec; the blocks must be kept open while they are used
+    blocks, arrays = [], {}
+    for name, block_name, shape, dtype in spec:
+        block = shared_memory.SharedMemory(name=block_name)
+        arrays[name] = np.ndarray(shape, dtype, buffer=block.buf)
+        blocks.append(block)
+    return blocks, arrays
+
+_blocks = []
+_networks = {}
+
+def init_worker(specs):
+    for schedule, spec in specs.items():
+        blocks, arrays = attach(spec)
+        _blocks.extend(blocks)
+        _networks[schedule] = TrainNetwork.from_arrays(arrays)
+
+def solve_chunk(chunk):
+    return process_problems(chunk, _networks)
+
+def process_problems_parallel(problem_df, networks, workers):
+    """
+    Same result as process_problems, with the problems spread over worker processes.
+    The networks are placed in shared memory once and every worker maps them instead
+    of building or unpickling its own copy. Problems that share schedule, cost
+    function and source stay in one chunk so their search is still shared, and the
+    answers are ordered by ProblemNo.
+    """
+    if workers <= 1:
+        return process_problems(problem_df, networks)
+
+    chunk_count = workers * CHUNKS_PER_WORKER
+    group = problem_df.groupby(['Schedule', 'CostFunction', problem_df['FromStation'].str.strip()],
+                               sort=True, dropna=False).ngroup()
+    chunks = [problem_df[group % chunk_count == k] for k in range(chunk_count)]
+    chunks = [chunk for chunk in chunks if len(chunk)]
+
+    blocks, specs = [], {}
+    try:
+        for schedule, network in networks.items():
+            schedule_blocks, specs[schedule] = share(network.arrays())
+            blocks.extend(schedule_blocks)
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(specs,)) as executor:
+            results = [result for result in executor.map(solve_chunk, chunks) if len(result)]
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    if not results:
+        return pd.DataFrame()
+    return pd.concat(results).sort_values('ProblemNo', kind='stable').reset_index(drop=True)
@@ -0,0 +1,185 @@
+import sys
+import numpy as np
+from csa import CHANGE_TIME, format_arrival, parse_clock
+from route_graph import TRAIN_TICKET
+from timetable import SECONDS_PER_DAY, trip_times
+
+MAX_ROUNDS = 8  # Most trains a journey may use
+
+def insert(bag, label):
+    # Adds label (arrival, price, ...) to a Pareto bag unless it is dominated; returns True if added
+    arrival, price = label[0], label[1]
+    for other in bag:
+        if other[0] <= arrival and other[1] <= price:
+            return False
+    bag[:] = [other for other in bag if not (arrival <= other[0] and price <= other[1])]
+    bag.append(label)
+    return True
+
+def dominated(bag, arrival, price):
+    return any(other[0] <= arrival and other[1] <= price for other in bag)
+
+class Raptor:
+    """
+    Round-based multi-criteria router (McRAPTOR) over a daily timetable.
+
+    Trains with the same sequence of stations form a route. Round k scans every route
+    through a station improved in round k - 1 and finds the journeys with k trains, so
+    a single query returns the Pareto set of (arrival time, transfers, price) for all
+    three criteria at once. As in ConnectionScan every train runs every day and
+    changing trains takes CHANGE_TIME; a leg costs min(TRAIN_TICKET, stops ridden).
+
+    The timetable is kept in contiguous arrays: the stations of route r are
+    route_stops[route_stop_offsets[r]:route_stop_offsets[r + 1]], its trips are
+    route_trip_offsets[r]..route_trip_offsets[r + 1] - 1 sorted by departure, and the
+    times and islno of trip t at position p are at trip_time_offsets[t] + p, with
+    times in seconds since the midnight before the trip leaves its first station.
+    station_route_offsets groups the (route, position) pairs serving each station.
+    """
+
+    def __init__(self, stops, cancelled=None):
+        # cancelled marks stops a train no longer serves; it runs as separate trips around them
+        arrival, departure = trip_times(stops)
+        self.stations = sorted(set(stops['station']))
+        self.station_index = {station: k for k, station in enumerate(self.stations)}
+        station = np.array([self.station_index[name] for name in stops['station']], dtype=np.int64)
+        islno = stops['islno'].to_numpy()
+
+        train = stops['train'].to_numpy()
+        running = np.ones(len(stops), dtype=bool) if cancelled is None else ~np.asarray(cancelled)
+        new_train = np.r_[True, train[1:] != train[:-1]]
+        starts = np.flatnonzero(running & (new_train | np.r_[True, ~running[:-1]]))
+        ends = np.flatnonzero(running & (np.r_[new_train[1:], True] | np.r_[~running[1:], True])) + 1
+        day = departure[starts] // SECONDS_PER_DAY * SECONDS_PER_DAY  # Midnight before each train leaves
+        routes = {}  # station sequence -> trips (first row of each train)
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            routes.setdefault(tuple(station[start:end].tolist()), []).append(start)
+
+        route_stops, route_stop_offsets, route_trip_offsets, trip_rows = [], [0], [0], []
+        for sequence, trips in routes.items():
+            route_stops.extend(sequence)
+            route_stop_offsets.append(len(route_stops))
+            trip_rows.extend(sorted(trips, key=lambda start: departure[start] % SECONDS_PER_DAY))
+            route_trip_offsets.append(len(trip_rows))
+        trip_rows = np.array(trip_rows, dtype=np.int64)
+        trip_length = ends[np.searchsorted(starts, trip_rows)] - trip_rows
+        rows = np.concatenate([np.arange(start, start + length) for start, length in zip(trip_rows, trip_length)])
+        shift = np.repeat(day[np.searchsorted(starts, trip_rows)], trip_length)
+
+        self.route_stops = np.array(route_stops, dtype=np.int64)
+        self.route_stop_offsets = np.array(route_stop_offsets, dtype=np.int64)
+        self.route_trip_offsets = np.array(route_trip_offsets, dtype=np.int64)
+        self.trip_time_offsets = np.r_[0, np.cumsum(trip_length)[:-1]]
+        self.trip_train = train[trip_rows]
+        self.stop_arrival = arrival[rows] - shift
+        self.stop_departure = departure[rows] - shift
+        self.stop_islno = islno[rows]
+
+        route_of_stop = np.repeat(np.arange(len(routes)), np.diff(self.route_stop_offsets))
+        position = np.arange(len(self.route_stops)) - self.route_stop_offsets[route_of_stop]
+        order = np.argsort(self.route_stops, kind='stable')
+        self.station_route_offsets = np.zeros(len(self.stations) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.route_stops, minlength=len(self.stations)), out=self.station_route_offsets[1:])
+        self.station_routes = route_of_stop[order]
+        self.station_positions = position[order]
+        self._lists = None
+
+    def lists(self):
+        # The rounds run in Python, where lists are faster to index than NumPy arrays
+        if self._lists is None:
+            self._lists = tuple(array.tolist() for array in (
+                self.route_stops, self.route_stop_offsets, self.route_trip_offsets, self.trip_time_offsets,
+                self.stop_arrival, self.stop_departure, self.station_route_offsets, self.station_routes,
+                self.station_positions))
+        return self._lists
+
+    def journeys(self, source, target, start_time, max_rounds=MAX_ROUNDS):
+        """
+        Returns the Pareto set of journeys from source to target leaving at or after
+        start_time (seconds after midnight of day 0), sorted by arrival: a list of
+        (arrival, transfers, price, legs) with legs as (train, from islno, to islno).
+        """
+        (route_stops, route_stop_offsets, route_trip_offsets, trip_time_offsets, stop_arrival,
+         stop_departure, station_route_offsets, station_routes, station_positions) = self.lists()
+        source, target = self.station_index[source], self.station_index[target]
+
+        labels = [(start_time, 0, -1, None)]  # arrival, price, previous label, (trip, board, alight)
+        previous = {source: [(start_time, 0, 0)]}  # Bags of the last round: station -> [(arrival, price, label)]
+        best = {source: [(start_time, 0, 0)]}  # Best bags over all rounds, for pruning
+        found = []
+        for rides in range(1, max_rounds + 1):
+            queue = {}  # route -> first position to scan
+            for station in previous:
+                for index in range(station_route_offsets[station], station_route_offsets[station + 1]):
+                    route, position = station_routes[index], station_positions[index]
+                    if position < queue.get(route, len(route_stops)):
+                        queue[route] = position
+
+            current = {}
+            target_bag = best.setdefault(target, [])
+            for route, first in queue.items():
+                route_start = route_stop_offsets[route]
+                route_bag = []  # (trip, day offset, board position, price paid before boarding, previous label)
+                for position in range(first, route_stop_offsets[route + 1] - route_start):
+                    station = route_stops[route_start + position]
+                    for trip, offset, board, paid, parent in route_bag:
+                        arrival = stop_arrival[trip_time_offsets[trip] + position] + offset
+                        price = paid + min(TRAIN_TICKET, position - board)
+                        if dominated(target_bag, arrival, price) or dominated(best.get(station, ()), arrival, price):
+                            continue
+                        labels.append((arrival, price, parent, (trip, board, position)))
+                        label = (arrival, price, len(labels) - 1)
+                        insert(best.setdefault(station, []), label)
+                        insert(current.setdefault(station, []), label)
+                        if station == target:
+                            found.append((arrival, rides - 1, price, len(labels) - 1))
+
+                    for arrival, price, label in previous.get(station, ()):
+                        ready = arrival if label == 0 else arrival + CHANGE_TIME  # No change time at the start
+                        instance = None
+                        for trip in range(route_trip_offsets[route], route_trip_offsets[route + 1]):
+                            departs = stop_departure[trip_time_offsets[trip] + position]
+                            offset = -((departs - ready) // SECONDS_PER_DAY) * SECONDS_PER_DAY  # Next day it runs
+                            if instance is None or departs + offset < instance[0]:
+                                instance = (departs + offset, trip, offset)
+                        _, trip, offset = instance
+                        # An earlier boarding of the same trip is better unless it costs more at the next stop
+                        if any(other[0] == trip and other[1] == offset and
+                               other[3] + min(TRAIN_TICKET, position + 1 - other[2]) <= price + 1 for other in route_bag):
+                            continue
+                        route_bag = [other for other in route_bag
+                                     if not (other[0] == trip and other[1] == offset and price <= other[3])]
+                        route_bag.append((trip, offset, position, price, label))
+            if not current:
+                break
+            previous = current
+
+        pareto = [journey for journey in found
+                  if not any(other[:3] != journey[:3] and all(a <= b for a, b in zip(other[:3], journey[:3]))
+                             for other in found)]
+        journeys = []
+        for arrival, transfers, price, label in sorted(set(pareto)):
+            legs = []
+            while labels[label][3] is not None:
+                trip, board, alight = labels[label][3]
+                legs.append((self.trip_train[trip], int(self.stop_islno[self.trip_time_offsets[trip] + board]),
+                             int(self.stop_islno[self.trip_time_offsets[trip] + alight])))
+                label = labels[label][2]
+            journeys.append((arrival, transfers, price, legs[::-1]))
+        return journeys
+
+def main():
+    # Prints the Pareto set of journeys between two stations
+    if len(sys.argv) not in (4, 5):
+        print("Usage: python raptor.py <schedule.csv> <from> <to> [HH:MM:SS]")
+        sys.exit(1)
+
+    from network import TrainNetwork  # Imported here because network imports this module
+    network = TrainNetwork.from_csv(sys.argv[1])
+    start_time = parse_clock(sys.argv[4]) if len(sys.argv) == 5 else 0
+    for arrival, transfers, price, legs in network.raptor.journeys(sys.argv[2], sys.argv[3], start_time):
+        connection = ' ; '.join(f"{train_no} : {start_islno} -> {end_islno}" for train_no, start_islno, end_islno in legs)
+        print(f"{format_arrival(arrival)}  transfers {transfers}  price {price}  {connection}")
+
+if __name__ == '__main__':
+    main()
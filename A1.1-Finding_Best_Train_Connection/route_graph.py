@@ -0,0 +1,221 @@
+import hashlib
+import numpy as np
+import networkx as nx
+from dijkstra import dijkstra, path_edges
+from timetable import build_edges
+
+TRAIN_TICKET = 10
+COSTS = ('stops', 'traveltime', 'price')
+BOARD, RIDE, ALIGHT = 0, 1, 2
+
+class RouteGraph:
+    """
+    Train-aware graph in which every train segment is kept, even if several trains
+    serve the same pair of stations.
+
+    Nodes are the stations (0..S-1) and two nodes per stop of a train (row k of the
+    cleaned schedule): S + k for travelling on stop tickets and S + n + k for
+    travelling on a train ticket. A journey boards a train at a station node, rides
+    from stop to stop and alights at a station node, so every leg of a connection is a
+    single train and changing trains means passing through a station.
+
+    Stop tickets cost 1 per ride edge and train tickets cost TRAIN_TICKET when boarding,
+    so the cheapest path pays min(10, stops) for every leg. The train ticket nodes are
+    only used by the price cost function (infinite weight otherwise).
+
+    Edges are stored as CSR arrays sorted by source node: the edges leaving node u are
+    offsets[u]..offsets[u + 1] - 1, with their targets, kind (BOARD, RIDE or ALIGHT),
+    stop row and one weight array per cost function.
+    """
+
+    def __init__(self, stops):
+        edges = build_edges(stops)
+        self.stations = sorted(set(stops['station']))
+        self.station_index = {station: k for k, station in enumerate(self.stations)}
+        self.stop_station = np.array([self.station_index[name] for name in stops['station']], dtype=np.int64)
+        self.stop_train = stops['train'].to_numpy(dtype=object)
+        self.stop_islno = stops['islno'].to_numpy()
+        station_count, stop_count = len(self.stations), len(stops)
+        self.node_count = station_count + 2 * stop_count
+
+        first = edges['stop']
+        second = first + 1
+        stop_ticket, train_ticket = station_count, station_count + stop_count
+        segment = edges['time_weight'].astype(np.float64)
+        zero, one, infinite = np.zeros(len(first)), np.ones(len(first)), np.full(len(first), np.inf)
+
+        # (source, target, kind, stop, stops weight, traveltime weight, price weight) per group of edges
+        groups = [
+            (self.stop_station[first], stop_ticket + first, BOARD, first, zero, zero, zero),
+            (self.stop_station[first], train_ticket + first, BOARD, first, infinite, infinite, zero + TRAIN_TICKET),
+            (stop_ticket + first, stop_ticket + second, RIDE, first, one, segment, one),
+            (train_ticket + first, train_ticket + second, RIDE, first, infinite, infinite, zero),
+            (stop_ticket + second, self.stop_station[second], ALIGHT, second, zero, zero, zero),
+            (train_ticket + second, self.stop_station[second], ALIGHT, second, zero, zero, zero),
+        ]
+        source = np.concatenate([group[0] for group in groups])
+        order = np.argsort(source, kind='stable')
+        self.offsets = np.zeros(self.node_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(source, minlength=self.node_count), out=self.offsets[1:])
+        self.source = source[order]
+        self.targets = np.concatenate([group[1] for group in groups])[order]
+        self.kind = np.concatenate([np.full(len(first), group[2], dtype=np.int8) for group in groups])[order]
+        self.stop = np.concatenate([group[3] for group in groups])[order]
+        self.weights = {cost: np.concatenate([group[4 + k] for group in groups])[order]
+                        for k, cost in enumerate(COSTS)}
+        self.landmarks = None  # Landmarks for A*, attached by the owner of the graph
+        self.hierarchies = None  # {cost: ContractionHierarchy}, attached by the owner of the graph
+        self._graph = None
+        self._lists = None
+        self._adjacency = {}
+
+    def arrays(self):
+        # Everything needed to rebuild the graph with from_arrays, as NumPy arrays without objects
+        arrays = {'stations': np.array(self.stations, dtype=str), 'stop_station': self.stop_station,
+                  'stop_train': np.array(self.stop_train, dtype=str), 'stop_islno': self.stop_islno,
+                  'offsets': self.offsets, 'source': self.source, 'targets': self.targets,
+                  'kind': self.kind, 'stop': self.stop}
+        arrays.update({f'{cost}_weight': self.weights[cost] for cost in COSTS})
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        graph = cls.__new__(cls)
+        graph.stations = arrays['stations'].tolist()
+        graph.station_index = {station: k for k, station in enumerate(graph.stations)}
+        for name in ('stop_station', 'stop_train', 'stop_islno', 'offsets', 'source', 'targets', 'kind', 'stop'):
+            setattr(graph, name, arrays[name])
+        graph.weights = {cost: arrays[f'{cost}_weight'] for cost in COSTS}
+        graph.node_count = len(graph.stations) + 2 * len(graph.stop_station)
+        graph.landmarks = None
+        graph.hierarchies = None
+        graph._graph = None
+        graph._lists = None
+        graph._adjacency = {}
+        return graph
+
+    @property
+    def graph(self):
+        # networkx view of the CSR arrays; the edge attribute 'id' is the CSR edge index
+        if self._graph is None:
+            self._graph = nx.DiGraph()
+            self._graph.add_nodes_from(range(self.node_count))
+            self._graph.add_edges_from((int(u), int(v), {'id': edge})
+                                       for edge, (u, v) in enumerate(zip(self.source, self.targets)))
+        return self._graph
+
+    def fingerprint(self):
+        # Identifies the graph that preprocessed data (landmarks, hierarchies) was computed on
+        digest = hashlib.sha1()
+        for array in (self.offsets, self.targets) + tuple(self.weights[cost] for cost in COSTS):
+            digest.update(np.ascontiguousarray(array).tobytes())
+        return digest.hexdigest()
+
+    def legs(self, edge_ids):
+        # Boarding and alighting edges of a path -> (train, from islno, to islno) per leg
+        legs = []
+        for edge in edge_ids:
+            if self.kind[edge] == BOARD:
+                boarded = self.stop[edge]
+            elif self.kind[edge] == ALIGHT:
+                legs.append((self.stop_train[boarded], int(self.stop_islno[boarded]), int(self.stop_islno[self.stop[edge]])))
+        return legs
+
+    def adjacency(self, cost):
+        # The search loop runs in Python, where lists are faster to index than NumPy arrays
+        if cost not in self._adjacency:
+            if self._lists is None:
+                self._lists = (self.offsets.tolist(), self.targets.tolist(), self.source.tolist())
+            self._adjacency[cost] = self.weights[cost].tolist()
+        offsets, targets, sources = self._lists
+        return offsets, targets, sources, self._adjacency[cost]
+
+    def set_weight(self, edge, cost, value):
+        # Patches one weight in place, in the array and in the list used by the search
+        self.weights[cost][edge] = value
+        if cost in self._adjacency:
+            self._adjacency[cost][edge] = value
+
+    def ride_edge(self, row):
+        # The stop ticket edge riding from stop row to the next stop of its train
+        node = len(self.stations) + row
+        for edge in range(self.offsets[node], self.offsets[node + 1]):
+            if self.kind[edge] == RIDE:
+                return edge
+        return None
+
+    def cancel_stop(self, row):
+        """
+        Makes every edge using stop row unusable (infinite weight for every cost):
+        boarding and alighting there and riding into or out of it.
+        """
+        station_count, stop_count = len(self.stations), len(self.stop_station)
+        nodes = (station_count + row, station_count + stop_count + row)
+        sources = (int(self.stop_station[row]), station_count + row - 1, station_count + stop_count + row - 1)
+        edges = [edge for node in nodes for edge in range(self.offsets[node], self.offsets[node + 1])]
+        edges += [edge for node in sources if node >= 0 for edge in range(self.offsets[node], self.offsets[node + 1])
+                  if self.targets[edge] in nodes]
+        for edge in edges:
+            for cost in COSTS:
+                self.set_weight(edge, cost, np.inf)
+
+    def invalidate(self, costs, decreased=()):
+        """
+        Drops the preprocessing that no longer holds after the weights of costs changed.
+        Hierarchies store shortcut weights and go for any change; landmark bounds stay
+        valid while weights only grow and go only for the costs in decreased.
+        """
+        if self.hierarchies is not None:
+            self.hierarchies = {cost: hierarchy for cost, hierarchy in self.hierarchies.items() if cost not in costs} or None
+        if self.landmarks is not None:
+            for cost in decreased:
+                self.landmarks.forget(cost)
+
+    def shortest_path(self, source, target, cost, backend=None):
+        """
+        Returns (legs, cost) of the cheapest connection between two station codes, or
+        (None, None) if there is none. backend='ch' queries the contraction hierarchy,
+        'alt' runs A* with the landmark bounds (plain Dijkstra if no landmarks are
+        attached), 'csr' plain Dijkstra and 'networkx' the same search through networkx
+        (slower, kept for comparison). By default the fastest available one is used.
+        """
+        if backend == 'networkx':
+            return self.shortest_path_networkx(source, target, cost)
+        return self.shortest_paths(source, [target], cost, backend)[target]
+
+    def shortest_paths(self, source, targets, cost, backend=None):
+        # {target: (legs, cost)}; one search from source answers every target, except for
+        # the contraction hierarchy which answers each target with its own fast query
+        if backend is None:
+            backend = 'ch' if cost in (self.hierarchies or {}) else 'alt'
+        if backend == 'ch':
+            results = {}
+            for target in targets:
+                edge_ids, total = self.hierarchies[cost].query(self.station_index[source], self.station_index[target])
+                results[target] = (None, None) if edge_ids is None else (self.legs(edge_ids), int(total))
+            return results
+
+        offsets, node_targets, sources, weights = self.adjacency(cost)
+        goals = {self.station_index[target] for target in targets}
+        potential = None
+        if backend == 'alt' and self.landmarks is not None:
+            potential = self.landmarks.potential(cost, sorted(goals))
+        distance, parent_edge = dijkstra(offsets, node_targets, weights, self.station_index[source], goals, potential)
+        results = {}
+        for target in targets:
+            node = self.station_index[target]
+            if node in distance:
+                results[target] = (self.legs(path_edges(parent_edge, sources, node)), int(distance[node]))
+            else:
+                results[target] = (None, None)
+        return results
+
+    def shortest_path_networkx(self, source, target, cost):
+        weights = self.weights[cost]
+        weight = lambda u, v, data: None if weights[data['id']] == np.inf else weights[data['id']]
+        try:
+            path = nx.dijkstra_path(self.graph, self.station_index[source], self.station_index[target], weight=weight)
+        except nx.NetworkXNoPath:
+            return None, None
+        edge_ids = [self.graph[path[i]][path[i + 1]]['id'] for i in range(len(path) - 1)]
+        return self.legs(edge_ids), int(sum(weights[edge] for edge in edge_ids))
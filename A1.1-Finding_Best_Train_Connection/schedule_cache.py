@@ -0,0 +1,89 @@
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+from timetable import clean_schedule
+
+ARRAYS = ('train_id', 'station_id', 'islno', 'arrival', 'departure', 'trains', 'stations')
+
+def cache_path(path, suffix):
+    # Preprocessed files of a schedule live in .cache/ next to it
+    directory, name = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, '.cache', name + suffix)
+
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def save_stops(stops, directory):
+    """
+    Writes a cleaned schedule as one .npy file per array: train_id and station_id
+    (int32 indices into trains and stations), islno, arrival and departure (int32
+    seconds since midnight).
+    """
+    train_id, trains = pd.factorize(stops['train'])
+    station_id, stations = pd.factorize(stops['station'])
+    arrays = {
+        'train_id': train_id.astype(np.int32),
+        'station_id': station_id.astype(np.int32),
+        'islno': stops['islno'].to_numpy(dtype=np.int32),
+        'arrival': stops['arrival'].to_numpy(dtype=np.int32),
+        'departure': stops['departure'].to_numpy(dtype=np.int32),
+        'trains': np.array(trains, dtype=str),
+        'stations': np.array(stations, dtype=str),
+    }
+    os.makedirs(directory, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, name + '.npy'), array)
+
+def stops_frame(arrays):
+    """
+    The stops DataFrame over arrays named as in ARRAYS, without copying them: islno,
+    arrival and departure are the arrays themselves, train and station are
+    categoricals over train_id and station_id, so names are only looked up where a
+    column is converted.
+    """
+    return pd.DataFrame({
+        'train': pd.Categorical.from_codes(arrays['train_id'], categories=arrays['trains']),
+        'islno': arrays['islno'],
+        'station': pd.Categorical.from_codes(arrays['station_id'], categories=arrays['stations']),
+        'arrival': arrays['arrival'],
+        'departure': arrays['departure'],
+    }, copy=False)
+
+def open_stops(directory):
+    # Memory maps the arrays written by save_stops; the int32 columns are read-only,
+    # users that change them (TrainNetwork.delay) replace the column
+    return stops_frame({name: np.load(os.path.join(directory, name + '.npy'), mmap_mode='r') for name in ARRAYS})
+
+def load_stops(path):
+    """
+    Returns clean_schedule(pd.read_csv(path)), read from a binary cache in
+    .cache/<schedule>.stops/ when possible. The cache is keyed by the SHA-1 of the
+    CSV; its size and mtime are checked first so an unchanged file is not hashed again.
+    The cache is rebuilt whenever the CSV changes.
+    """
+    directory = cache_path(path, '.stops')
+    meta_path = os.path.join(directory, 'meta.json')
+    status = os.stat(path)
+    meta = {'size': status.st_size, 'mtime_ns': status.st_mtime_ns}
+
+    cached = None
+    if os.path.exists(meta_path):
+        with open(meta_path) as file:
+            cached = json.load(file)
+    if cached is not None and cached['size'] == meta['size'] and cached['mtime_ns'] == meta['mtime_ns']:
+        return open_stops(directory)
+
+    meta['sha1'] = file_hash(path)
+    if cached is None or cached['sha1'] != meta['sha1']:
+        if cached is not None:
+            os.remove(meta_path)  # The arrays are invalid until the new meta.json is written
+        save_stops(clean_schedule(pd.read_csv(path)), directory)
+    with open(meta_path, 'w') as file:
+        json.dump(meta, file)
+    return open_stops(directory)
@@ -0,0 +1,143 @@
+import json
+import os
+import signal
+import socketserver
+import sys
+import threading
+import time
+from collections import deque
+import numpy as np
+import pandas as pd
+from main import process_problems
+from network import TrainNetwork
+
+COLUMNS = ['ProblemNo', 'FromStation', 'ToStation', 'Schedule', 'CostFunction']
+PERCENTILES = (50, 90, 99)
+
+class QueryServer:
+    """
+    Resident query mode: every schedule is loaded once and kept in memory, so a batch
+    of problems only pays for the searches.
+
+    Requests are JSON lines. A line is one problem (an object with the columns of
+    problems.csv) or a list of problems, which are answered together like the rows of
+    a problem file; every answer is written back as one line with ProblemNo,
+    Connection and Cost. {"command": "stats"} returns the latency percentiles of the
+    recent requests. At most max_concurrent requests are searched at the same time.
+    """
+
+    def __init__(self, schedule_dir, max_concurrent=4, history=10000):
+        self.schedule_dir = schedule_dir
+        self.networks = {}
+        self.latencies = deque(maxlen=history)  # Seconds per request, most recent last
+        self._load_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+
+    def schedule_path(self, schedule):
+        # Only files directly in schedule_dir can be loaded
+        return os.path.join(self.schedule_dir, os.path.basename(schedule))
+
+    def network(self, schedule):
+        # Returns the TrainNetwork of a schedule file, loading it on first use
+        with self._load_lock:
+            if schedule not in self.networks:
+                self.networks[schedule] = TrainNetwork.from_csv(self.schedule_path(schedule))
+            return self.networks[schedule]
+
+    def answer(self, problems):
+        problem_df = pd.DataFrame([dict(problem) for problem in problems], columns=COLUMNS)
+        problem_df['ProblemNo'] = problem_df['ProblemNo'].fillna(pd.Series(range(len(problem_df)))).astype(int)
+        networks = {schedule: self.network(schedule) for schedule in problem_df['Schedule'].dropna().unique()
+                    if os.path.isfile(self.schedule_path(schedule))}
+
+        problem_numbers = problem_df['ProblemNo'].tolist()
+        # An unknown station would fail the whole batch in process_problems, so those problems are answered here
+        errors = {}
+        for problem in problem_df.itertuples(index=False):
+            network = networks.get(problem.Schedule)
+            if network is not None:
+                unknown = [station for station in (str(problem.FromStation).strip(), str(problem.ToStation).strip())
+                           if station not in network.route_graph.station_index]
+                if unknown:
+                    errors[problem.ProblemNo] = f"Unknown station {', '.join(unknown)}"
+
+        answers = []
+        problem_df = problem_df[~problem_df['ProblemNo'].isin(errors)]
+        if len(problem_df):
+            with self._slots:
+                start = time.perf_counter()
+                answers = process_problems(problem_df, networks).to_dict('records')
+                self.latencies.append(time.perf_counter() - start)
+
+        answered = {answer['ProblemNo'] for answer in answers}
+        for problem_no in problem_numbers:
+            if problem_no not in answered:
+                answers.append({'ProblemNo': problem_no, 'error': errors.get(problem_no, 'Unknown schedule or cost function')})
+        return answers
+
+    def stats(self):
+        latencies = np.array(self.latencies) * 1000
+        stats = {'requests': len(latencies), 'schedules': sorted(self.networks)}
+        if len(latencies):
+            stats.update({f'p{p}_ms': float(np.percentile(latencies, p)) for p in PERCENTILES})
+            stats['max_ms'] = float(latencies.max())
+        return stats
+
+    def handle_line(self, line):
+        # One request line -> list of response objects
+        try:
+            request = json.loads(line)
+            if isinstance(request, dict) and 'command' in request:
+                if request['command'] == 'stats':
+                    return [self.stats()]
+                return [{'error': f"Unknown command {request['command']!r}"}]
+            return self.answer(request if isinstance(request, list) else [request])
+        except (ValueError, KeyError, TypeError) as error:
+            return [{'error': str(error)}]
+
+    def serve(self, lines, write):
+        for line in lines:
+            if line.strip():
+                for response in self.handle_line(line):
+                    write(json.dumps(response, default=int) + '\n')
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        def write(text):
+            self.wfile.write(text.encode())
+            self.wfile.flush()
+        self.server.query_server.serve(self.rfile, write)
+
+class UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def main():
+    # Reads requests from stdin, or from a Unix socket if a socket path is given
+    if not 2 <= len(sys.argv) <= 4:
+        print("Usage: python server.py <schedule_dir> [socket_path|-] [max_concurrent]")
+        sys.exit(1)
+
+    max_concurrent = int(sys.argv[3]) if len(sys.argv) == 4 else 4
+    query_server = QueryServer(sys.argv[1], max_concurrent)
+    if len(sys.argv) == 2 or sys.argv[2] == '-':
+        def write(text):
+            sys.stdout.write(text)
+            sys.stdout.flush()
+        query_server.serve(sys.stdin, write)
+        return
+
+    socket_path = sys.argv[2]
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))  # Remove the socket on kill as well
+    with UnixServer(socket_path, RequestHandler) as server:
+        server.query_server = query_server
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.remove(socket_path)
+
+if __name__ == '__main__':
+    main()
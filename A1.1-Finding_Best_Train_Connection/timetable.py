@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+def strip_quotes(column):
+    return column.astype(str).str.replace("'", "", regex=False).str.strip()
+
+def time_to_seconds(column):
+    # 'HH:MM:SS' (with or without quotes) -> seconds since midnight, for the whole column at once
+    parts = strip_quotes(column).str.split(':', expand=True).astype(np.int64)
+    return (parts[0] * 3600 + parts[1] * 60 + parts[2]).to_numpy()
+
+def clean_schedule(schedule_df):
+    """
+    Returns the columns needed for routing: train (string, so leading zeros survive),
+    islno, station, arrival and departure (seconds since midnight). Trains keep the
+    order in which they first appear in the file, stops are sorted by islno. The input
+    DataFrame is not modified.
+    """
+    train = strip_quotes(schedule_df['Train No.'])
+    stops = pd.DataFrame({
+        'train_order': pd.factorize(train)[0],
+        'train': train,
+        'islno': schedule_df['islno'].to_numpy(dtype=np.int64),
+        'station': strip_quotes(schedule_df['station Code']),
+        'arrival': time_to_seconds(schedule_df['Arrival time']),
+        'departure': time_to_seconds(schedule_df['Departure time']),
+    })
+    stops = stops.sort_values(['train_order', 'islno'], kind='stable')
+    return stops.drop(columns='train_order').reset_index(drop=True)
+
+def trip_times(stops):
+    """
+    Arrival and departure of every stop in seconds since the midnight before the train
+    leaves its first stop, so that times never go backwards along a train ("add a day"
+    whenever a time is smaller than the one before). Returns two int64 arrays.
+
+    The arrival at the first stop and the departure at the last stop are placeholders
+    in the data and are set to the departure and arrival of that stop.
+    """
+    train = stops['train'].to_numpy()
+    first = np.ones(len(stops), dtype=bool)
+    first[1:] = train[1:] != train[:-1]
+    last = np.ones(len(stops), dtype=bool)
+    last[:-1] = first[1:]
+
+    arrival = np.where(first, stops['departure'].to_numpy(), stops['arrival'].to_numpy())
+    departure = np.where(last, arrival, stops['departure'].to_numpy())
+    times = np.column_stack((arrival, departure)).ravel().astype(np.int64)  # arrival, departure, arrival, ...
+
+    # Waiting time from the previous event of the same train, then a running sum per train
+    steps = np.zeros(len(times), dtype=np.int64)
+    steps[1:] = (times[1:] - times[:-1]) % SECONDS_PER_DAY
+    steps[0::2][first] = 0
+    elapsed = np.cumsum(steps)
+    train_start = np.flatnonzero(first) * 2
+    elapsed -= np.repeat(elapsed[train_start], np.diff(np.append(train_start, len(times))))
+    absolute = np.repeat(times[train_start], np.diff(np.append(train_start, len(times)))) + elapsed
+    return absolute[0::2], absolute[1::2]
+
+def build_edges(stops):
+    """
+    Builds one edge per pair of consecutive stops of a train in a single pass.
+
+    stops is a schedule cleaned by clean_schedule. Returns a dict of NumPy arrays with
+    one entry per edge: stop (row of the first stop in stops), train, from_station,
+    to_station, start/end (islno), islno_weight, time_weight (seconds from departure to
+    the next arrival, over midnight if needed), price_weight, departure and arrival.
+    """
+    following = stops.groupby('train', sort=False)[['islno', 'station', 'arrival']].shift(-1)
+    has_next = following['islno'].notna().to_numpy()
+    stops, following = stops[has_next], following[has_next]
+
+    start = stops['islno'].to_numpy()
+    end = following['islno'].to_numpy(dtype=np.int64)
+    islno_weight = np.abs(end - start)
+    departure = stops['departure'].to_numpy()
+    arrival = following['arrival'].to_numpy(dtype=np.int64)
+    return {
+        'stop': np.flatnonzero(has_next),
+        'train': stops['train'].to_numpy(dtype=object),
+        'from_station': stops['station'].to_numpy(dtype=object),
+        'to_station': following['station'].to_numpy(dtype=object),
+        'start': start,
+        'end': end,
+        'islno_weight': islno_weight,
+        'time_weight': (arrival - departure) % SECONDS_PER_DAY,
+        'price_weight': np.minimum(10, islno_weight),
+        'departure': departure,
+        'arrival': arrival,
+    }
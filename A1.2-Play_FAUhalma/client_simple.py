@@ -1,10 +1,11 @@
+import functools
 import itertools
 import json
 import logging
 import requests
 import time
 import random
-from typing import List, Tuple, Dict
+from typing import Dict, Iterator, List, Tuple
 
 class Hex:
     def __init__(self, x: int, y: int):
@@ -53,10 +54,10 @@ STAR_VALID_POSITIONS = {
     (3,-6)
 }
 
+BLOCKED_SPACES = {(-1, 2), (0, 0), (-1, -1), (2, -1)}  # Permanently blocked
+
 def is_valid_position(hex: Hex, board_type: str) -> bool:
-    # Check for permanently blocked spaces
-    blocked_spaces = {(-1, 2), (0, 0), (-1, -1), (2, -1)}
-    if (hex.x, hex.y) in blocked_spaces:
+    if (hex.x, hex.y) in BLOCKED_SPACES:
         return False
 
     if board_type == 'rhombus':
@@ -74,107 +75,134 @@ def get_goal_area(player: str, board_type: str) -> List[Hex]:
     else:  # player C (for 3-player game on star board)
         return [Hex(6, -3), Hex(5, -3), Hex(5, -2), Hex(4, -3), Hex(4, -2), Hex(4, -1)]
 
-def get_possible_moves(hex: Hex, board: Dict[str, List[Hex]], board_type: str) -> List[List[Hex]]:
-    occupied = set(peg for pegs in board.values() for peg in pegs)
-    moves = []
-    
-    for neighbor in hex.neighbors():
-        if is_valid_position(neighbor, board_type) and neighbor not in occupied:
-            moves.append([hex, neighbor])
-    
-    def hop(start: Hex, current: Hex, path: List[Hex]):
-        for next_hex in current.neighbors():
-            if next_hex in occupied:
-                jump = Hex(next_hex.x + (next_hex.x - current.x), 
-                           next_hex.y + (next_hex.y - current.y))
-                if is_valid_position(jump, board_type) and jump not in occupied and jump not in path:
-                    new_path = path + [jump]
-                    moves.append([start] + new_path)
-                    hop(start, jump, new_path)
-
-    hop(hex, hex, [])
-    return moves
+def bits(mask: int) -> Iterator[int]:
+    # Indices of the set bits of mask, lowest first
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+class Board:
+    """
+    The cells of a board as integer indices; a set of cells (the pegs of a player, all
+    occupied cells) is an int with bit i set for cell i. Neighbours, jumps and the
+    per-cell scores of evaluate_position are looked up in tables built once per board type.
+    """
+
+    def __init__(self, board_type: str):
+        self.board_type = board_type
+        self.cells = [Hex(x, y) for x, y in sorted(RHOMBUS_VALID_POSITIONS if board_type == 'rhombus'
+                                                   else STAR_VALID_POSITIONS)
+                      if is_valid_position(Hex(x, y), board_type)]
+        self.index = {cell: i for i, cell in enumerate(self.cells)}
+        self.steps = []  # cell -> mask of its neighbours
+        self.jumps = []  # cell -> [(mask of the cell jumped over, cell landed on)]
+        self.near = []  # cell -> mask of the other cells within distance 2
+        for cell in self.cells:
+            steps, jumps = 0, []
+            for neighbor in cell.neighbors():
+                if neighbor in self.index:
+                    steps |= 1 << self.index[neighbor]
+                    landing = Hex(2 * neighbor.x - cell.x, 2 * neighbor.y - cell.y)
+                    if landing in self.index:
+                        jumps.append((1 << self.index[neighbor], self.index[landing]))
+            self.steps.append(steps)
+            self.jumps.append(jumps)
+            self.near.append(sum(1 << i for i, other in enumerate(self.cells) if 0 < other.distance(cell) <= 2))
+        self.scores = {}  # player -> cell -> 10 in the goal area, 10 - distance to it otherwise
+
+    def mask(self, pegs: List[List[int]]) -> int:
+        return sum(1 << self.index[Hex(x, y)] for x, y in pegs)
+
+    def goal_scores(self, player: str) -> List[int]:
+        if player not in self.scores:
+            goal_area = get_goal_area(player, self.board_type)
+            self.scores[player] = [10 if cell in goal_area else 10 - min(cell.distance(goal) for goal in goal_area)
+                                   for cell in self.cells]
+        return self.scores[player]
+
+    def moves(self, cell: int, occupied: int) -> List[List[int]]:
+        """
+        Moves of the peg on cell as paths of cell indices: the steps to empty neighbours,
+        then one jump sequence to every cell reachable by jumping over pegs.
+        """
+        moves = [[cell, target] for target in bits(self.steps[cell] & ~occupied)]
+        occupied &= ~(1 << cell)  # The peg has left its cell while it jumps
+        visited = 1 << cell
+        stack = [[cell]]
+        while stack:
+            path = stack.pop()
+            for over, landing in self.jumps[path[-1]]:
+                if occupied & over and not (occupied | visited) >> landing & 1:
+                    visited |= 1 << landing
+                    moves.append(path + [landing])
+                    stack.append(moves[-1])
+        return moves
+
+    def score(self, pegs: int, player: str) -> int:
+        scores = self.goal_scores(player)
+        total = 0
+        for cell in bits(pegs):
+            others = pegs & ~(1 << cell)
+            total += scores[cell]
+            if self.steps[cell] & others:
+                total += 2  # Can hop over each other
+            if not self.near[cell] & others:
+                total -= 5  # Isolated
+        return total
+
+@functools.lru_cache(maxsize=None)
+def get_board(board_type: str) -> Board:
+    return Board(board_type)
+
+def get_possible_moves(cell: int, position: Dict[str, int], board: Board) -> List[List[int]]:
+    occupied = 0
+    for pegs in position.values():
+        occupied |= pegs
+    return board.moves(cell, occupied)
 
 def manhattan_distance(hex1: Hex, hex2: Hex) -> int:
     return (abs(hex1.x - hex2.x) + abs(hex1.y - hex2.y) + abs(hex1.z - hex2.z)) // 2
 
-def evaluate_position(position: Dict[str, List[Hex]], player: str, board_type: str) -> float:
-    goal_area = get_goal_area(player, board_type)
+def evaluate_position(position: Dict[str, int], player: str, board: Board) -> float:
     opponent = 'B' if player == 'A' else 'A'
-    opponent_goal_area = get_goal_area(opponent, board_type)
-    
-    player_score = 0
-    opponent_score = 0
-    
-    for peg in position[player]:
-        if peg in goal_area:
-            player_score += 10
-        else:
-            player_score += 10 - min(peg.distance(goal) for goal in goal_area)
-    
-    for peg in position[opponent]:
-        if peg in opponent_goal_area:
-            opponent_score += 10
-        else:
-            opponent_score += 10 - min(peg.distance(goal) for goal in opponent_goal_area)
-    
-    # Add bonus for pieces that can hop over each other
-    player_score += sum(2 for peg in position[player] if any(other.distance(peg) == 1 for other in position[player] if other != peg))
-    opponent_score += sum(2 for peg in position[opponent] if any(other.distance(peg) == 1 for other in position[opponent] if other != peg))
-    
-    # Penalize isolated pieces
-    player_score -= sum(5 for peg in position[player] if all(other.distance(peg) > 2 for other in position[player] if other != peg))
-    opponent_score -= sum(5 for peg in position[opponent] if all(other.distance(peg) > 2 for other in position[opponent] if other != peg))
-    
-    return player_score - opponent_score
+    return board.score(position[player], player) - board.score(position[opponent], opponent)
 
-def minimax(position: Dict[str, List[Hex]], depth: int, alpha: float, beta: float, maximizing_player: bool, 
-            player: str, players: List[str], board_type: str, time_limit: float, start_time: float) -> Tuple[float, List[Hex]]:
+def minimax(position: Dict[str, int], depth: int, alpha: float, beta: float, maximizing_player: bool, 
+            player: str, players: List[str], board: Board, time_limit: float, start_time: float) -> Tuple[float, List[int]]:
     if depth == 0 or time.time() - start_time > time_limit:
-        return evaluate_position(position, player, board_type), None
-
-    if maximizing_player:
-        max_eval = float('-inf')
-        best_move = None
-        for peg in position[player]:
-            for move in get_possible_moves(peg, position, board_type):
-                new_position = {p: [hex for hex in pegs] for p, pegs in position.items()}
-                new_position[player].remove(move[0])
-                new_position[player].append(move[-1])
-                
-                eval, _ = minimax(new_position, depth - 1, alpha, beta, False, player, players, board_type, time_limit, start_time)
-                if eval > max_eval:
-                    max_eval = eval
+        return evaluate_position(position, player, board), None
+
+    occupied = 0
+    for pegs in position.values():
+        occupied |= pegs
+    mover = player if maximizing_player else players[(players.index(player) + 1) % len(players)]
+    best_eval = float('-inf') if maximizing_player else float('inf')
+    best_move = None
+    for peg in bits(position[mover]):
+        for move in board.moves(peg, occupied):
+            new_position = dict(position)
+            new_position[mover] ^= (1 << move[0]) | (1 << move[-1])
+
+            eval, _ = minimax(new_position, depth - 1, alpha, beta, not maximizing_player, player, players, board,
+                              time_limit, start_time)
+            if maximizing_player:
+                if eval > best_eval:
+                    best_eval = eval
                     best_move = move
                 alpha = max(alpha, eval)
-                if beta <= alpha:
-                    break
-        return max_eval, best_move
-    else:
-        min_eval = float('inf')
-        best_move = None
-        next_player = players[(players.index(player) + 1) % len(players)]
-        for peg in position[next_player]:
-            for move in get_possible_moves(peg, position, board_type):
-                new_position = {p: [hex for hex in pegs] for p, pegs in position.items()}
-                new_position[next_player].remove(move[0])
-                new_position[next_player].append(move[-1])
-                
-                eval, _ = minimax(new_position, depth - 1, alpha, beta, True, player, players, board_type, time_limit, start_time)
-                if eval < min_eval:
-                    min_eval = eval
+            else:
+                if eval < best_eval:
+                    best_eval = eval
                     best_move = move
                 beta = min(beta, eval)
-                if beta <= alpha:
-                    break
-        return min_eval, best_move
+            if beta <= alpha:
+                break
+    return best_eval, best_move
 
 def agent_function(request_dict: Dict) -> List[List[int]]:
-    position = {player: [Hex(x, y) for x, y in pegs] for player, pegs in request_dict.items()}
     player = 'A'  # We are always player A
     # board_type = request_dict.get('board_type', 'rhombus')  # Default to star if not specified
-    players = list(position.keys())
-    num_players = len(players)
     
     #function to choose board based on the configuration file
     import os
@@ -187,6 +215,9 @@ def agent_function(request_dict: Dict) -> List[List[int]]:
     full_path = sys.argv[1]
     file_name = os.path.basename(full_path)
     board_type = choose_board(file_name)
+    board = get_board(board_type)
+    position = {player: board.mask(pegs) for player, pegs in request_dict.items()}
+    players = list(position.keys())
 
     max_depth = 3 if board_type == 'rhombus' else 4
     time_limit = 1.5 if board_type == 'rhombus' else 2.0
@@ -196,7 +227,7 @@ def agent_function(request_dict: Dict) -> List[List[int]]:
     best_move = None
     
     for depth in range(1, max_depth + 1):
-        eval, move = minimax(position, depth, float('-inf'), float('inf'), True, player, players, board_type, time_limit, start_time)
+        eval, move = minimax(position, depth, float('-inf'), float('inf'), True, player, players, board, time_limit, start_time)
         # print(f"Depth {depth}: Eval = {eval}, Move = {move}")
         if time.time() - start_time > time_limit:
             # print("Time limit reached")
@@ -206,12 +237,8 @@ def agent_function(request_dict: Dict) -> List[List[int]]:
             best_move = move
     
     if best_move:
-        if all(is_valid_position(hex, board_type) for hex in best_move):
-            # print(f"Chosen move: {best_move}")
-            return [[hex.x, hex.y] for hex in best_move]
-        else:
-            # print(f"Warning: Invalid move detected: {best_move}")
-            return None
+        # print(f"Chosen move: {best_move}")
+        return [[board.cells[cell].x, board.cells[cell].y] for cell in best_move]
     
     # print("No valid move found")
     return None